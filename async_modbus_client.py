@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步Modbus客户端模块
+
+基于asyncio实现，单个事件循环即可同时轮询多个网关/从站：
+- TCP:  asyncio流，后台读任务按MBAP事务ID分发响应，并发请求天然流水线化
+- RTU:  非阻塞串口封装（timeout=0 + in_waiting轮询），同一串口上的请求由锁串行化
+
+与同步ModbusClient一致，超时/校验失败返回None；
+调用方取消(CancelledError)会向上传播，并清理该请求的在途状态。
+"""
+
+import asyncio
+import struct
+import time
+
+import serial
+
+from modbus_client import (
+    build_read_request, build_write_register_request, build_write_registers_request,
+    decode_registers, check_response
+)
+from modbus_transport import (
+    MBAP_HEADER_LEN, ModbusTransport, RtuFramingMixin, RtuFrameReceiver,
+    rtu_char_time, rtu_expected_length, format_hex
+)
+
+
+class AsyncModbusTransport(ModbusTransport):
+    """异步传输层基类，接口同ModbusTransport，但open/close/transact为协程"""
+
+    async def open(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def transact(self, slave_id, pdu, resp_pdu_len, timeout=None):
+        raise NotImplementedError
+
+
+class AsyncTcpTransport(AsyncModbusTransport):
+    """异步Modbus TCP传输"""
+
+    supports_pipelining = True
+
+    def __init__(self, host, port=502, timeout=1):
+        super().__init__(timeout)
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.reader_task = None
+        self.pending = {}  # 事务ID -> Future
+        self.transaction_id = 0
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        self.reader_task = asyncio.ensure_future(self.read_loop())
+        return True
+
+    async def close(self):
+        if self.reader_task:
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.reader_task = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+        self.fail_pending(ConnectionError("连接已关闭"))
+
+    def is_open(self):
+        return self.writer is not None and self.reader_task is not None and not self.reader_task.done()
+
+    def fail_pending(self, error):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def read_loop(self):
+        """后台接收任务：按事务ID把响应交给对应的等待者"""
+        try:
+            while True:
+                header = await self.reader.readexactly(MBAP_HEADER_LEN)
+                transaction_id, protocol_id, length, _ = struct.unpack('>HHHB', header)
+                if protocol_id != 0 or length < 2:
+                    raise ConnectionError(f"非法MBAP报文头: {format_hex(header)}")
+                pdu = await self.reader.readexactly(length - 1)
+                self.log("接收：" + format_hex(header + pdu))
+                future = self.pending.pop(transaction_id, None)
+                if future is None or future.done():
+                    # 已超时或已取消请求的迟到响应，丢弃
+                    self.log(f"丢弃过期事务{transaction_id}的响应")
+                    continue
+                future.set_result(pdu)
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, OSError) as e:
+            self.log(f"网络通信错误: {e}")
+            self.fail_pending(ConnectionError(str(e)))
+
+    async def transact(self, slave_id, pdu, resp_pdu_len, timeout=None):
+        if not self.is_open():
+            return None
+        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+        transaction_id = self.transaction_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[transaction_id] = future
+        request = struct.pack('>HHHB', transaction_id, 0, len(pdu) + 1, slave_id) + pdu
+        try:
+            self.writer.write(request)
+            self.log("发送：" + format_hex(request))
+            await self.writer.drain()
+            resp = await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.log(f"事务{transaction_id}响应超时")
+            return None
+        except (ConnectionError, OSError) as e:
+            self.log(f"网络通信错误: {e}")
+            return None
+        finally:
+            self.pending.pop(transaction_id, None)
+        self.log_exception_response(resp)
+        return resp
+
+
+class AsyncRtuOverTcpTransport(RtuFramingMixin, AsyncModbusTransport):
+    """异步RTU over TCP传输，同一连接上的请求串行执行"""
+
+    def __init__(self, host, port=502, timeout=1):
+        super().__init__(timeout)
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        return True
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+
+    def is_open(self):
+        return self.writer is not None
+
+    async def read_frame(self):
+        buf = bytearray()
+        buf += await self.reader.readexactly(3)
+        expected = rtu_expected_length(buf)
+        if expected is None:
+            return bytes(buf)
+        buf += await self.reader.readexactly(expected - len(buf))
+        return bytes(buf)
+
+    async def transact(self, slave_id, pdu, resp_pdu_len, timeout=None):
+        if not self.is_open():
+            return None
+        async with self.lock:
+            request = self.build_rtu_frame(slave_id, pdu)
+            try:
+                self.writer.write(request)
+                self.log("发送：" + format_hex(request))
+                await self.writer.drain()
+                frame = await asyncio.wait_for(self.read_frame(), self.timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                self.log("响应超时")
+                # 残留的半帧无法再对齐，重建连接
+                await self.reconnect()
+                return None
+            except asyncio.CancelledError:
+                await asyncio.shield(self.reconnect())
+                raise
+            except (asyncio.IncompleteReadError, OSError) as e:
+                self.log(f"网络通信错误: {e}")
+                await self.close()
+                return None
+            self.log("接收：" + format_hex(frame))
+            self.log_exception_response(frame[1:])
+            return self.parse_rtu_frame(slave_id, frame)
+
+    async def reconnect(self):
+        await self.close()
+        try:
+            await self.open()
+        except (OSError, asyncio.TimeoutError) as e:
+            self.log(f"重新连接失败: {e}")
+
+
+class AsyncSerialRtuTransport(RtuFramingMixin, AsyncModbusTransport):
+    """
+    异步串口RTU传输
+    串口以timeout=0非阻塞方式打开，接收时轮询in_waiting并让出事件循环
+    """
+
+    def __init__(self, port, baudrate=9600, timeout=1):
+        super().__init__(timeout)
+        self.port = port
+        self.baudrate = baudrate
+        self.ser = None
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, bytesize=8, parity='N',
+                                 stopbits=1, timeout=0)
+        return self.ser.is_open
+
+    async def close(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def is_open(self):
+        return bool(self.ser and self.ser.is_open)
+
+    async def read_frame(self, max_len, timeout):
+        poll = min(rtu_char_time(self.baudrate) * 2, 0.001)
+        start = time.perf_counter()
+        receiver = RtuFrameReceiver(max_len, self.baudrate, start)
+        while True:
+            waiting = self.ser.in_waiting
+            now = time.perf_counter()
+            if waiting:
+                receiver.feed(self.ser.read(receiver.wanted(waiting)), now)
+            if receiver.is_complete(now) or now - start > timeout:
+                break
+            await asyncio.sleep(0 if waiting else poll)
+        return bytes(receiver.buf)
+
+    async def transact(self, slave_id, pdu, resp_pdu_len, timeout=None):
+        if not self.is_open():
+            return None
+        async with self.lock:
+            request = self.build_rtu_frame(slave_id, pdu)
+            self.ser.reset_input_buffer()
+            self.ser.write(request)
+            self.log("发送：" + format_hex(request))
+            # 被取消时锁随async with释放，下一个请求会先清空接收缓冲区
+            frame = await self.read_frame(resp_pdu_len + 3, self.timeout if timeout is None else timeout)
+            self.log("接收：" + format_hex(frame))
+            self.log_exception_response(frame[1:])
+            return self.parse_rtu_frame(slave_id, frame)
+
+
+class AsyncModbusClient:
+    """异步Modbus客户端"""
+
+    def __init__(self, slave_id=1):
+        self.transport = None
+        self.slave_id = slave_id
+        self.log_callback = None
+
+    def set_log_callback(self, callback):
+        self.log_callback = callback
+        if self.transport:
+            self.transport.log_callback = callback
+
+    async def connect(self, transport):
+        """使用指定的异步传输层建立连接"""
+        await self.disconnect()
+        transport.log_callback = self.log_callback
+        try:
+            ok = bool(await transport.open())
+        except (OSError, asyncio.TimeoutError, serial.SerialException) as e:
+            print(f"连接失败: {e}")
+            ok = False
+        if ok:
+            self.transport = transport
+        return ok
+
+    async def connect_tcp(self, host, port=502, timeout=1):
+        return await self.connect(AsyncTcpTransport(host, port, timeout))
+
+    async def connect_rtu_over_tcp(self, host, port=502, timeout=1):
+        return await self.connect(AsyncRtuOverTcpTransport(host, port, timeout))
+
+    async def connect_rtu(self, port, baudrate=9600, timeout=1):
+        return await self.connect(AsyncSerialRtuTransport(port, baudrate, timeout))
+
+    async def disconnect(self):
+        if self.transport:
+            await self.transport.close()
+        self.transport = None
+
+    def is_connected(self):
+        return bool(self.transport and self.transport.is_open())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    async def execute(self, pdu, resp_pdu_len, slave_id=None, timeout=None):
+        """执行一次请求，返回功能码匹配的响应PDU，异常响应或失败返回None"""
+        if not self.is_connected():
+            return None
+        slave_id = self.slave_id if slave_id is None else slave_id
+        resp = await self.transport.transact(slave_id, pdu, resp_pdu_len, timeout)
+        return check_response(pdu, resp, resp_pdu_len)
+
+    async def read_holding_registers(self, address, count, slave_id=None, timeout=None):
+        pdu, resp_pdu_len = build_read_request(0x03, address, count)
+        resp = await self.execute(pdu, resp_pdu_len, slave_id, timeout)
+        return None if resp is None else decode_registers(resp, count)
+
+    async def read_input_registers(self, address, count, slave_id=None, timeout=None):
+        pdu, resp_pdu_len = build_read_request(0x04, address, count)
+        resp = await self.execute(pdu, resp_pdu_len, slave_id, timeout)
+        return None if resp is None else decode_registers(resp, count)
+
+    async def write_holding_register(self, address, value, slave_id=None, timeout=None):
+        pdu, resp_pdu_len = build_write_register_request(address, value)
+        return await self.execute(pdu, resp_pdu_len, slave_id, timeout) is not None
+
+    async def write_holding_registers(self, address, values, slave_id=None, timeout=None):
+        pdu, resp_pdu_len = build_write_registers_request(address, values)
+        return await self.execute(pdu, resp_pdu_len, slave_id, timeout) is not None
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多从站总线轮询调度模块
+
+一个调度器负责一条总线上任意多个 (slave_id, 寄存器区间, 周期) 轮询任务。
+调度器本身不访问总线，到期的任务以后台轮询优先级提交到该总线的请求队列(RequestQueue)，
+与写入、用户读取等请求共用一个工作线程；同一时刻只有一个轮询请求在途：
+- 每次从到期任务中选截止时间最早的一个执行，同一时刻到期的任务按轮转顺序，保证公平
+- 按实测（初始按帧长度估算）的单次轮询耗时计算总线负载，
+  需求超过带宽预算时所有任务周期按同一比例放大，而不是让排在后面的任务饿死
+- 连续失败（从站离线、超时）的任务按指数退避延长自己的周期，超时不计入总线负载，
+  不拖慢其它任务
+- 统计每个任务的实际轮询速率，与请求速率对比
+"""
+
+import threading
+import time
+from functools import partial
+
+from modbus_client import build_read_request, decode_registers, check_response
+from modbus_transport import rtu_char_time, rtu_silent_interval
+from read_planner import plan_reads
+from request_queue import PRIORITY_POLL
+
+RTU_TURNAROUND = 0.005  # 从站响应延迟估计（秒）
+TCP_TRANSACTION_TIME = 0.01  # TCP单次事务耗时初始估计（秒）
+COST_SMOOTHING = 0.2  # 耗时滑动平均系数
+MAX_FAILURE_BACKOFF = 16  # 连续失败时周期最多放大的倍数
+
+
+class PollJob:
+    """轮询任务"""
+
+    def __init__(self, slave_id, address, count, interval, callback=None, name=None):
+        self.slave_id = slave_id
+        self.address = address
+        self.count = count
+        self.interval = interval
+        self.callback = callback  # callback(job, regs)，在请求队列工作线程中调用，失败时regs为None
+        self.name = name or f"{slave_id}@{address}"
+        self.blocks = plan_reads([(address, count)])
+        self.next_due = 0.0
+        self.cost = None  # 单次轮询总线耗时（秒）
+        self.started = None  # 首次完成轮询的时间
+        self.last_completed = None
+        self.completed = 0
+        self.failures = 0
+        self.skipped = 0  # 错过的周期和排队过期被丢弃的请求
+        self.backoff = 1  # 连续失败的退避倍数，成功后恢复为1
+
+    def requested_rate(self):
+        return 1.0 / self.interval
+
+    def achieved_rate(self):
+        if self.completed < 2 or self.last_completed <= self.started:
+            return 0.0
+        return (self.completed - 1) / (self.last_completed - self.started)
+
+
+class BusScheduler:
+    """总线轮询调度器"""
+
+    def __init__(self, request_queue, utilization=0.8, timeout=None):
+        """
+        request_queue: 该总线的请求队列，轮询请求经它在工作线程中执行
+        utilization: 允许轮询占用的总线时间比例（带宽预算）
+        timeout: 轮询请求的专用超时，None时使用连接超时
+        """
+        self.request_queue = request_queue
+        self.client = request_queue.client
+        self.utilization = utilization
+        self.timeout = timeout
+        self.jobs = []
+        self.stretch = 1.0  # 周期放大系数
+        self.lock = threading.Lock()  # 保护任务表（调度线程与工作线程回调共用）
+        self.idle = threading.Event()  # 没有在途的轮询请求
+        self.idle.set()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.cursor = 0  # 轮转起点
+
+    def add_job(self, slave_id, address, count, interval, callback=None, name=None):
+        job = PollJob(slave_id, address, count, interval, callback, name)
+        job.cost = self.estimate_cost(job)
+        with self.lock:
+            self.jobs.append(job)
+            self.update_stretch()
+        return job
+
+    def add_model_job(self, slave_id, sunspec_protocol, model_id, interval, callback=None, base_address=None):
+        """
+        按扫描到的模型地址添加轮询任务（同型号设备的模型布局相同）
+        base_address: 该从站的SunSpec基地址，与扫描设备不同时按相对基地址的偏移换算
+        """
+        address = sunspec_protocol.model_base_addrs.get(model_id)
+        if address is None:
+            return None
+        if base_address is not None and sunspec_protocol.base_address is not None:
+            address += base_address - sunspec_protocol.base_address
+        length = sunspec_protocol.model_lengths.get(model_id)
+        if length is None:
+            table_info = sunspec_protocol.get_table_info(model_id)
+            if not table_info:
+                return None
+            count = table_info['length']
+        else:
+            count = 2 + length
+        return self.add_job(slave_id, address, count, interval, callback, name=f"{slave_id}:{model_id}")
+
+    def remove_job(self, job):
+        with self.lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+                self.update_stretch()
+
+    def estimate_cost(self, job):
+        """按帧长度估算单次轮询的总线耗时"""
+        transport = self.client.transport
+        baudrate = getattr(transport, 'baudrate', None)
+        if not baudrate:
+            return TCP_TRANSACTION_TIME * len(job.blocks)
+        cost = 0.0
+        for _, count in job.blocks:
+            # 请求8字节，响应5+2n字节，两个帧间隔加从站响应延迟
+            frame_chars = 8 + 5 + 2 * count
+            cost += frame_chars * rtu_char_time(baudrate) + 2 * rtu_silent_interval(baudrate) + RTU_TURNAROUND
+        return cost
+
+    def bus_load(self):
+        """按请求周期（含失败退避）计算的总线负载（占用时间比例）"""
+        return sum(job.cost / (job.interval * job.backoff) for job in self.jobs)
+
+    def update_stretch(self):
+        load = self.bus_load()
+        self.stretch = max(1.0, load / self.utilization) if self.utilization > 0 else 1.0
+
+    def next_job(self, now):
+        """选出到期任务中截止时间最早的一个，同时到期时从轮转起点开始选"""
+        count = len(self.jobs)
+        best = None
+        for i in range(count):
+            job = self.jobs[(self.cursor + i) % count]
+            if job.next_due <= now and (best is None or job.next_due < best.next_due):
+                best = job
+        if best is not None:
+            self.cursor = (self.jobs.index(best) + 1) % count
+        return best
+
+    def poll(self, job, modbus_client):
+        """执行一次轮询（工作线程），返回 (寄存器列表或None, 耗时)"""
+        start = time.monotonic()
+        requests = []
+        for address, count in job.blocks:
+            pdu, resp_pdu_len = build_read_request(0x03, address, count)
+            requests.append((job.slave_id, pdu, resp_pdu_len))
+        responses = modbus_client.transact_many(requests, timeout=self.timeout)
+        regs = []
+        for (_, count), (_, pdu, resp_pdu_len), resp in zip(job.blocks, requests, responses):
+            resp = check_response(pdu, resp, resp_pdu_len)
+            if resp is None:
+                return None, time.monotonic() - start
+            regs.extend(decode_registers(resp, count))
+        return regs, time.monotonic() - start
+
+    def submit_pending(self, now=None):
+        """
+        把一个到期任务提交到请求队列
+        返回距下一个任务到期的秒数，已提交时返回0，没有任务时返回None
+        """
+        with self.lock:
+            if not self.jobs:
+                return None
+            now = time.monotonic() if now is None else now
+            job = self.next_job(now)
+            if job is None:
+                return max(0.0, min(j.next_due for j in self.jobs) - now)
+            interval = job.interval * self.stretch * job.backoff
+            job.next_due += interval
+            if job.next_due < now:
+                # 落后超过一个周期时丢弃错过的周期，避免补发造成突发
+                missed = int((now - job.next_due) / interval) + 1
+                job.skipped += missed
+                job.next_due += missed * interval
+            self.idle.clear()
+        # 到下一个周期还没轮到执行的请求已经过时，由队列直接丢弃
+        self.request_queue.submit(partial(self.poll, job), PRIORITY_POLL, now + interval,
+                                  partial(self.finished, job))
+        return 0.0
+
+    def finished(self, job, request):
+        """轮询请求完成或被丢弃（工作线程）"""
+        regs = None
+        with self.lock:
+            if request.dropped:
+                job.skipped += 1
+            else:
+                if request.result is not None:
+                    # request.result为None表示轮询函数抛出异常
+                    regs, elapsed = request.result
+                done = time.monotonic()
+                if regs is None:
+                    # 失败的耗时主要是超时等待，不计入单次耗时；只延长该任务自己的周期
+                    job.failures += 1
+                    job.backoff = min(job.backoff * 2, MAX_FAILURE_BACKOFF)
+                    job.next_due = max(job.next_due, done + job.interval * self.stretch * job.backoff)
+                else:
+                    job.cost += COST_SMOOTHING * (elapsed - job.cost)
+                    job.backoff = 1
+                    if job.started is None:
+                        job.started = done
+                    job.last_completed = done
+                    job.completed += 1
+                self.update_stretch()
+        self.idle.set()
+        if job.callback and not request.dropped:
+            job.callback(job, regs)
+
+    def run(self):
+        """调度循环，直到stop()"""
+        while not self.stop_event.is_set():
+            # 上一个轮询请求完成后才提交下一个，写入等请求可以插在两次轮询之间
+            if not self.idle.wait(0.1):
+                continue
+            wait = self.submit_pending()
+            if wait != 0.0:
+                self.stop_event.wait(0.1 if wait is None else min(wait, 0.1))
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.idle.set()
+        now = time.monotonic()
+        with self.lock:
+            # 首次到期时间在各自周期内错开，避免所有任务同时到期
+            for i, job in enumerate(self.jobs):
+                job.next_due = now + job.interval * i / len(self.jobs)
+                job.started = job.last_completed = None
+                job.completed = job.failures = job.skipped = 0
+                job.backoff = 1
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止提交新的轮询（已在队列中的请求照常完成或被丢弃）"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def report(self):
+        """各任务的请求速率与实际速率"""
+        with self.lock:
+            return {
+                'bus_load': self.bus_load(),
+                'stretch': self.stretch,
+                'jobs': [{
+                    'name': job.name,
+                    'slave_id': job.slave_id,
+                    'requested_hz': job.requested_rate(),
+                    'achieved_hz': job.achieved_rate(),
+                    'completed': job.completed,
+                    'failures': job.failures,
+                    'skipped': job.skipped,
+                    'backoff': job.backoff,
+                    'cost_ms': job.cost * 1000,
+                } for job in self.jobs],
+            }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备映射缓存模块
+
+把扫描得到的SunSpec基地址和模型地址表按设备身份持久化到JSON文件，
+设备身份 = 连接(串口号/主机:端口) + 从站ID，并以Common模型(1)的序列号校验。
+下次连接同一设备时只需一次读取（"SunS"标记 + Common模型头 + 序列号）
+校验缓存，校验通过即可跳过基地址探测和模型链扫描。
+"""
+
+import json
+import os
+import time
+
+from sunspec_codec import TYPE_DECODERS
+
+CACHE_FORMAT_VERSION = 1
+COMMON_MODEL_ID = 1
+SERIAL_OFFSET = 4 + 48  # 相对基地址: "SunS"(2) + 模型头(2) + Mn/Md/Opt/Vr(48)
+SERIAL_SIZE = 16
+SIGNATURE_COUNT = SERIAL_OFFSET + SERIAL_SIZE  # 校验读取的寄存器数
+
+
+def connection_identity(modbus_client):
+    """由当前连接得到设备身份键，未连接时返回None"""
+    transport = modbus_client.transport
+    if transport is None:
+        return None
+    host = getattr(transport, 'host', None)
+    if host is not None:
+        link = f"{type(transport).__name__}:{host}:{transport.port}"
+    else:
+        link = f"serial:{transport.port}"
+    return f"{link}#{modbus_client.slave_id}"
+
+
+def parse_signature(regs):
+    """
+    解析校验读取的寄存器，返回序列号字符串
+    寄存器不是以Common模型开头的SunSpec映射时返回None
+    """
+    if not regs or len(regs) < SIGNATURE_COUNT:
+        return None
+    if regs[2] != COMMON_MODEL_ID:
+        return None
+    return TYPE_DECODERS['string'](regs, SERIAL_OFFSET, SERIAL_OFFSET + SERIAL_SIZE)
+
+
+class DeviceMapCache:
+    """设备映射缓存"""
+
+    def __init__(self, path='.device_maps.json'):
+        self.path = path
+        self.entries = self.read()
+
+    def read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"读取设备映射缓存失败: {e}")
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CACHE_FORMAT_VERSION:
+            return {}
+        return data.get('devices', {})
+
+    def write(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_FORMAT_VERSION, 'devices': self.entries}, f,
+                          ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"写入设备映射缓存失败: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def save(self, identity, signature, base_address, model_map, model_lengths, chain_end):
+        """
+        保存设备映射
+        signature: 从基地址读取的SIGNATURE_COUNT个寄存器
+        """
+        if identity is None or parse_signature(signature) is None:
+            return False
+        self.entries[identity] = {
+            'signature': list(signature[:SIGNATURE_COUNT]),
+            'serial_number': parse_signature(signature),
+            'base_address': base_address,
+            # JSON键只能是字符串，读取时转换回int
+            'model_map': {str(k): v for k, v in model_map.items()},
+            'model_lengths': {str(k): v for k, v in model_lengths.items()},
+            'chain_end': chain_end,
+            'saved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.write()
+        return True
+
+    def lookup(self, identity, read_func):
+        """
+        查找并校验设备映射
+        read_func: (address, count) -> 寄存器列表，只调用一次
+        命中返回 (base_address, model_map, model_lengths, chain_end, serial_number)，否则返回None
+        """
+        entry = self.entries.get(identity)
+        if not entry:
+            return None
+        base_address = entry['base_address']
+        regs = read_func(base_address, SIGNATURE_COUNT)
+        if not regs or list(regs[:SIGNATURE_COUNT]) != entry['signature']:
+            return None
+        model_map = {int(k): v for k, v in entry['model_map'].items()}
+        model_lengths = {int(k): v for k, v in entry['model_lengths'].items()}
+        return base_address, model_map, model_lengths, entry['chain_end'], entry['serial_number']
+
+    def forget(self, identity):
+        if self.entries.pop(identity, None) is not None:
+            self.write()
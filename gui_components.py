@@ -10,6 +10,8 @@ import threading
 import time
 import serial.tools.list_ports
 import datetime
+from functools import partial
+from request_queue import PRIORITY_READ, PRIORITY_WRITE
 
 # 添加语言管理器导入
 try:
@@ -35,13 +37,18 @@ class DataTableFrame(ttk.Frame):
         
         self.entries = {}
         self.headers = []  # 保存表头引用
+        # 时间列显示值最后变化的时间；为False时显示最后一次收到数据的时间
+        self.show_last_changed = True
+        self.displayed = {}  # field_name -> 当前显示的值文本
+        self.pending = {}  # field_name -> (值文本或None, 时间文本)，等待空闲时写入控件
+        self.flush_id = None
         self.setup_table()
 
     def setup_table(self):
         headers = [
             self.language_manager.get_text("field_name"),
             self.language_manager.get_text("value"),
-            self.language_manager.get_text("update_time"),
+            self.language_manager.get_text("last_changed" if self.show_last_changed else "update_time"),
             self.language_manager.get_text("unit"),
             self.language_manager.get_text("type"),
             self.language_manager.get_text("description"),
@@ -100,6 +107,14 @@ class DataTableFrame(ttk.Frame):
             ttk.Label(self, textvariable=write_status_var).grid(row=row, column=10, sticky='nsew')
             self.entries[field_name] = (value_var, update_time_var, write_var, write_status_var)
 
+    def submit_io(self, func, on_done, priority):
+        """经主窗口的I/O引擎在后台访问总线，结果在主线程中交给on_done；没有I/O引擎时直接执行"""
+        io_engine = getattr(self.main_window, 'io_engine', None)
+        if io_engine is None:
+            on_done(func(self.modbus_client))
+            return
+        io_engine.submit(func, on_done, priority)
+
     def read_field(self, field_name):
         # 检查是否已连接
         if not self.modbus_client.is_connected():
@@ -117,21 +132,21 @@ class DataTableFrame(ttk.Frame):
         addr = base_addr + offset
         length = self.fields[field_name]["size"]
         
-        # 读取数据
-        data = self.modbus_client.read_holding_registers(addr, length)
-        if data:
+        def read(client):
+            data = client.read_holding_registers(addr, length)
+            if not data:
+                return None
             # 使用专门的单字段解析方法
-            field_data = self.protocol.parse_single_field(self.table_id, field_name, data)
-            if field_data:
-                self.entries[field_name][0].set(str(field_data['value']))
-                now = datetime.datetime.now().strftime("%H:%M:%S")
-                self.entries[field_name][1].set(str(now))
-            else:
-                self.entries[field_name][0].set("Err")
-                self.entries[field_name][1].set("-")
+            return self.protocol.parse_single_field(self.table_id, field_name, data)
+        self.submit_io(read, partial(self.show_field, field_name), PRIORITY_READ)
+
+    def show_field(self, field_name, field_data):
+        """显示单字段读取结果，读取或解析失败时field_data为None"""
+        if field_data:
+            self.display_data({field_name: field_data})
         else:
-            self.entries[field_name][0].set("Err")
-            self.entries[field_name][1].set("-")
+            self.displayed[field_name] = "Err"
+            self.queue_cell(field_name, "Err", "-")
 
     def write_field(self, field_name):
         # 检查是否已连接
@@ -148,23 +163,71 @@ class DataTableFrame(ttk.Frame):
         base_addr = self.main_window.model_base_addrs[self.table_id]   
         offset = self.fields[field_name]["offset"]
         addr = base_addr + offset
-        value_str = self.entries[field_name][2].get()
+        value_str = self.get_write_value(field_name)
         try:
             value = int(value_str)
         except Exception:
-            self.entries[field_name][3].set(self.language_manager.get_text("format_error"))
+            self.set_write_status(field_name, self.language_manager.get_text("format_error"))
             return
-        ok = self.modbus_client.write_holding_register(addr, value)
-        self.entries[field_name][3].set(self.language_manager.get_text("success") if ok else self.language_manager.get_text("failed"))
+        # 写入以最高优先级排队，后台轮询进行中也只需等待当前请求完成
+        self.submit_io(lambda client: client.write_holding_register(addr, value),
+                       partial(self.show_write_status, field_name), PRIORITY_WRITE)
+
+    def show_write_status(self, field_name, ok):
+        self.set_write_status(field_name, self.language_manager.get_text("success") if ok else self.language_manager.get_text("failed"))
+
+    def get_write_value(self, field_name):
+        return self.entries[field_name][2].get()
+
+    def set_write_status(self, field_name, text):
+        self.entries[field_name][3].set(text)
 
     def display_data(self, data):
+        """
+        显示解析结果：与当前显示的值比较，只更新变化的字段，
+        控件更新合并到一次空闲回调中执行
+        """
         now = datetime.datetime.now().strftime("%H:%M:%S")
         for field_name, v in data.items():
-            if field_name in self.entries:
-                self.entries[field_name][0].set(str(v['value']))
-                self.entries[field_name][1].set(str(now))
+            if field_name not in self.entries:
+                continue
+            text = str(v['value'])
+            if self.displayed.get(field_name) != text:
+                self.displayed[field_name] = text
+                self.queue_cell(field_name, text, now)
+            elif not self.show_last_changed:
+                # 值未变，只刷新时间
+                pending_text = self.pending.get(field_name, (None, None))[0]
+                self.queue_cell(field_name, pending_text, now)
+
+    def queue_cell(self, field_name, text, stamp):
+        """登记一个待更新的单元格，text为None时只更新时间"""
+        self.pending[field_name] = (text, stamp)
+        if self.flush_id is None:
+            self.flush_id = self.after_idle(self.flush_display)
+
+    def flush_display(self):
+        self.flush_id = None
+        pending, self.pending = self.pending, {}
+        for field_name, (text, stamp) in pending.items():
+            self.set_cell(field_name, text, stamp)
+
+    def set_cell(self, field_name, text, stamp):
+        value_var, update_time_var = self.entries[field_name][:2]
+        if text is not None:
+            value_var.set(text)
+        update_time_var.set(stamp)
+
+    def cancel_display(self):
+        """丢弃显示缓存和尚未执行的控件更新"""
+        if self.flush_id is not None:
+            self.after_cancel(self.flush_id)
+            self.flush_id = None
+        self.pending.clear()
+        self.displayed.clear()
 
     def clear_data(self):
+        self.cancel_display()
         for field_name, (value_var, update_time_var, _, write_status_var) in self.entries.items():
             value_var.set('-')
             update_time_var.set('-')
@@ -178,7 +241,7 @@ class DataTableFrame(ttk.Frame):
         new_headers = [
             self.language_manager.get_text("field_name"),
             self.language_manager.get_text("value"),
-            self.language_manager.get_text("update_time"),
+            self.language_manager.get_text("last_changed" if self.show_last_changed else "update_time"),
             self.language_manager.get_text("unit"),
             self.language_manager.get_text("type"),
             self.language_manager.get_text("description"),
@@ -205,6 +268,168 @@ class DataTableFrame(ttk.Frame):
             if isinstance(write_btn, ttk.Button):
                 write_btn.configure(text=self.language_manager.get_text("write"))
 
+class VirtualTableFrame(DataTableFrame):
+    """
+    Treeview实现的数据表格：每个点是一行Treeview条目而不是一组控件，
+    只有可见行会被绘制，上千行的模型也能快速建立。
+    读写通过选中行后下方的操作面板进行（双击行直接读取），
+    重复组显示为可展开的父行，每个重复行一条子行。
+    """
+
+    COLUMNS = ('value', 'update_time', 'unit', 'type', 'description', 'access', 'write_status')
+
+    def __init__(self, parent, table_id, protocol, modbus_client, main_window=None, language_manager=None, **kwargs):
+        self.group_names = protocol.get_table_info(table_id).get('groups', {})
+        self.group_rows = {}  # 组名 -> 已显示（或等待显示）的行数
+        super().__init__(parent, table_id, protocol, modbus_client, main_window, language_manager, **kwargs)
+
+    def header_texts(self):
+        return [
+            self.language_manager.get_text("field_name"),
+            self.language_manager.get_text("value"),
+            self.language_manager.get_text("last_changed" if self.show_last_changed else "update_time"),
+            self.language_manager.get_text("unit"),
+            self.language_manager.get_text("type"),
+            self.language_manager.get_text("description"),
+            self.language_manager.get_text("access_rights"),
+            self.language_manager.get_text("write_status"),
+        ]
+
+    def setup_table(self):
+        table_frame = ttk.Frame(self)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(table_frame, columns=self.COLUMNS, show='tree headings', selectmode='extended')
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        col_widths = [160, 100, 80, 60, 70, 240, 60, 80]
+        for column, width in zip(('#0',) + self.COLUMNS, col_widths):
+            self.tree.column(column, width=width, minwidth=40, stretch=column in ('#0', 'description'))
+        self.update_headers()
+
+        # entries: field_name -> Treeview行id（与字段名相同）
+        for field_name, field_info in self.fields.items():
+            self.tree.insert('', 'end', iid=field_name, text=field_info.get('label', field_name),
+                             values=('-', '-', field_info.get('unit', ''), field_info.get('type', ''),
+                                     field_info.get('description', ''), field_info.get('access', 'r'), ''))
+            self.entries[field_name] = field_name
+        for group_name in self.group_names:
+            self.tree.insert('', 'end', iid=group_name, text=group_name, values=('-', '-', '', 'group', '', 'r', ''))
+            self.entries[group_name] = group_name
+
+        # 操作面板：对选中的行读取/写入
+        panel = ttk.Frame(self)
+        panel.pack(fill=tk.X, pady=(5, 0))
+        self.selected_var = tk.StringVar(value='-')
+        ttk.Label(panel, textvariable=self.selected_var, width=24).pack(side=tk.LEFT)
+        self.read_btn = ttk.Button(panel, text=self.language_manager.get_text("read"), command=self.read_selected)
+        self.read_btn.pack(side=tk.LEFT, padx=(5, 0))
+        self.write_value_label = ttk.Label(panel, text=self.language_manager.get_text("write_value"))
+        self.write_value_label.pack(side=tk.LEFT, padx=(10, 5))
+        self.write_var = tk.StringVar(value='')
+        self.write_entry = ttk.Entry(panel, textvariable=self.write_var, width=10, state='disabled')
+        self.write_entry.pack(side=tk.LEFT)
+        self.write_btn = ttk.Button(panel, text=self.language_manager.get_text("write"),
+                                    command=self.write_selected, state='disabled')
+        self.write_btn.pack(side=tk.LEFT, padx=(5, 0))
+
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<Double-1>', lambda e: self.read_selected())
+
+    def update_headers(self):
+        for column, text in zip(('#0',) + self.COLUMNS, self.header_texts()):
+            self.tree.heading(column, text=text)
+
+    def selected_fields(self):
+        return [iid for iid in self.tree.selection() if iid in self.fields]
+
+    def on_select(self, event=None):
+        selected = self.selected_fields()
+        self.selected_var.set(', '.join(selected[:3]) + (' ...' if len(selected) > 3 else '') if selected else '-')
+        # 只能对单个可写字段写入
+        writable = len(selected) == 1 and self.fields[selected[0]].get('access', 'r') == 'rw'
+        state = 'normal' if writable else 'disabled'
+        self.write_entry.configure(state=state)
+        self.write_btn.configure(state=state)
+
+    def read_selected(self):
+        for field_name in self.selected_fields():
+            self.read_field(field_name)
+
+    def write_selected(self):
+        selected = self.selected_fields()
+        if len(selected) == 1:
+            self.write_field(selected[0])
+
+    def get_write_value(self, field_name):
+        return self.write_var.get()
+
+    def set_write_status(self, field_name, text):
+        self.tree.set(field_name, 'write_status', text)
+
+    def display_data(self, data):
+        groups = {name: data[name] for name in self.group_names if name in data}
+        if groups:
+            data = {name: v for name, v in data.items() if name not in groups}
+            now = datetime.datetime.now().strftime("%H:%M:%S")
+            for group_name, group in groups.items():
+                self.display_group(group_name, group, now)
+        super().display_data(data)
+
+    def display_group(self, group_name, group, stamp):
+        """按行显示重复组，每行的字段合并为一个文本，同样只更新变化的行"""
+        count = group.get('count', 0)
+        text = str(count)
+        if self.displayed.get(group_name) != text:
+            self.displayed[group_name] = text
+            self.queue_cell(group_name, text, stamp)
+        names = list(group.get('fields', {}))
+        rows = group['value'] if count else []
+        for i, row in enumerate(rows):
+            iid = f"{group_name}:{i}"
+            text = ', '.join(f"{name}={row[name]}" for name in names)
+            if self.displayed.get(iid) != text:
+                self.displayed[iid] = text
+                self.queue_cell(iid, text, stamp)
+        # 行数减少时删除多余的子行
+        for i in range(count, self.group_rows.get(group_name, 0)):
+            iid = f"{group_name}:{i}"
+            self.pending.pop(iid, None)
+            self.displayed.pop(iid, None)
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+        self.group_rows[group_name] = count
+
+    def set_cell(self, field_name, text, stamp):
+        if not self.tree.exists(field_name):
+            # 重复组的子行在第一次有数据时才创建
+            group_name, index = field_name.rsplit(':', 1)
+            self.tree.insert(group_name, 'end', iid=field_name, text=f"{group_name}[{index}]",
+                             values=('', '', '', '', '', 'r', ''))
+        if text is not None:
+            self.tree.set(field_name, 'value', text)
+        self.tree.set(field_name, 'update_time', stamp)
+
+    def clear_data(self):
+        self.cancel_display()
+        self.group_rows.clear()
+        for group_name in self.group_names:
+            self.tree.delete(*self.tree.get_children(group_name))
+        for iid in self.entries:
+            self.tree.set(iid, 'value', '-')
+            self.tree.set(iid, 'update_time', '-')
+            self.tree.set(iid, 'write_status', '')
+
+    def update_language(self, language_manager):
+        """更新语言"""
+        self.language_manager = language_manager
+        self.update_headers()
+        self.read_btn.configure(text=self.language_manager.get_text("read"))
+        self.write_btn.configure(text=self.language_manager.get_text("write"))
+        self.write_value_label.configure(text=self.language_manager.get_text("write_value"))
+
 class ConnectionFrame(ttk.LabelFrame):
     """连接设置框架"""
     def __init__(self, parent, language_manager=None, **kwargs):
@@ -268,18 +493,43 @@ class ConnectionFrame(ttk.LabelFrame):
         self.disconnect_btn = ttk.Button(rtu_frame, text=self.language_manager.get_text("disconnect"))
         self.disconnect_btn.grid(row=1, column=5)
         
+        # 第三行：TCP连接设置（Modbus TCP / RTU over TCP）
+        self.tcp_connection_label = ttk.Label(rtu_frame, text=self.language_manager.get_text("tcp_connection"))
+        self.tcp_connection_label.grid(row=2, column=0, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        self.tcp_host_var = tk.StringVar(value="192.168.1.100")
+        ttk.Entry(rtu_frame, textvariable=self.tcp_host_var, width=14).grid(row=2, column=1, padx=(0, 5), pady=(5, 0))
+        
+        self.tcp_port_label = ttk.Label(rtu_frame, text=self.language_manager.get_text("tcp_port"))
+        self.tcp_port_label.grid(row=2, column=2, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        self.tcp_port_var = tk.StringVar(value="502")
+        ttk.Entry(rtu_frame, textvariable=self.tcp_port_var, width=8).grid(row=2, column=3, padx=(0, 10), pady=(5, 0))
+        
+        self.tcp_mode_var = tk.StringVar(value="Modbus TCP")
+        ttk.Combobox(rtu_frame, textvariable=self.tcp_mode_var, 
+                     values=["Modbus TCP", "RTU over TCP"], 
+                     state="readonly", width=12).grid(row=2, column=4, padx=(0, 5), pady=(5, 0))
+        
+        self.connect_tcp_btn = ttk.Button(rtu_frame, text=self.language_manager.get_text("connect_tcp"))
+        self.connect_tcp_btn.grid(row=2, column=5, pady=(5, 0))
+        
         # 初始化COM口列表
         self.refresh_ports()
 
-    def update_buttons_state(self, is_connected):
-        """更新按钮状态"""
-        if is_connected:
+    def update_buttons_state(self, is_connected, busy=False):
+        """更新按钮状态，busy为True（正在连接）时全部禁用"""
+        if busy:
+            self.connect_rtu_btn.configure(state="disabled")
+            self.connect_tcp_btn.configure(state="disabled")
+            self.disconnect_btn.configure(state="disabled")
+        elif is_connected:
             # 已连接：禁用连接按钮，启用断开按钮
             self.connect_rtu_btn.configure(state="disabled")
+            self.connect_tcp_btn.configure(state="disabled")
             self.disconnect_btn.configure(state="normal")
         else:
             # 未连接：启用连接按钮，禁用断开按钮
             self.connect_rtu_btn.configure(state="normal")
+            self.connect_tcp_btn.configure(state="normal")
             self.disconnect_btn.configure(state="disabled")
 
     def update_language(self, language_manager):
@@ -295,9 +545,12 @@ class ConnectionFrame(ttk.LabelFrame):
         self.baud_rate_label.configure(text=self.language_manager.get_text("baud_rate"))
         self.slave_id_label.configure(text=self.language_manager.get_text("slave_id"))
         self.timeout_label.configure(text=self.language_manager.get_text("timeout_seconds"))
+        self.tcp_connection_label.configure(text=self.language_manager.get_text("tcp_connection"))
+        self.tcp_port_label.configure(text=self.language_manager.get_text("tcp_port"))
         
         # 更新按钮文本
         self.connect_rtu_btn.configure(text=self.language_manager.get_text("connect_rtu"))
+        self.connect_tcp_btn.configure(text=self.language_manager.get_text("connect_tcp"))
         self.disconnect_btn.configure(text=self.language_manager.get_text("disconnect"))
 
     def refresh_ports(self):
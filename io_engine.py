@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GUI后台I/O引擎模块
+
+总线操作全部在请求队列(RequestQueue)的工作线程中执行，Tk主线程只负责提交请求和显示结果：
+- submit():  提交func(modbus_client)，完成后on_done(result)在Tk主线程中调用
+- post():    任意线程把一个回调交给Tk主线程执行（如日志）
+结果经线程安全队列传回，由root.after定时取出，主线程从不阻塞在串口/网络上。
+"""
+
+import queue
+import threading
+
+from request_queue import PRIORITY_READ
+
+DRAIN_INTERVAL_MS = 50  # 结果队列检查周期
+
+
+class IoEngine:
+    """后台I/O引擎"""
+
+    def __init__(self, root, request_queue, interval_ms=DRAIN_INTERVAL_MS):
+        self.root = root
+        self.request_queue = request_queue
+        self.interval_ms = interval_ms
+        self.results = queue.Queue()  # (callback, args)
+        self.after_id = None
+
+    def start(self):
+        self.request_queue.start()
+        if self.after_id is None:
+            self.after_id = self.root.after(self.interval_ms, self.drain)
+
+    def stop(self, timeout=None):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.request_queue.stop(timeout)
+
+    def post(self, callback, *args):
+        """在Tk主线程中执行callback(*args)，可从任意线程调用"""
+        if threading.current_thread() is threading.main_thread():
+            callback(*args)
+        else:
+            self.results.put((callback, args))
+
+    def submit(self, func, on_done=None, priority=PRIORITY_READ, deadline=None, on_dropped=None):
+        """
+        在I/O线程中执行func(modbus_client)
+        on_done(result): 执行完成后在主线程中调用
+        on_dropped(): 请求过期被丢弃时在主线程中调用
+        """
+        def finished(request):
+            if request.dropped:
+                if on_dropped:
+                    self.results.put((on_dropped, ()))
+            elif on_done:
+                self.results.put((on_done, (request.result,)))
+        return self.request_queue.submit(func, priority, deadline, finished)
+
+    def drain(self):
+        """取出工作线程的结果并在主线程中处理"""
+        try:
+            while True:
+                callback, args = self.results.get_nowait()
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"处理后台I/O结果失败: {e}")
+        except queue.Empty:
+            pass
+        self.after_id = self.root.after(self.interval_ms, self.drain)
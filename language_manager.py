@@ -23,11 +23,15 @@ class LanguageManager:
                 "slave_id": "从站ID:",
                 "timeout_seconds": "超时(秒):",
                 "connect_rtu": "连接RTU",
+                "tcp_connection": "TCP连接:",
+                "tcp_port": "端口:",
+                "connect_tcp": "连接TCP",
                 "disconnect": "断开",
                 "scan_base_address": "扫描SunSpec基地址",
                 "current_base_address": "当前基地址:",
                 "not_scanned": "未扫描",
                 "scan_model_address": "扫描模型地址",
+                "scan_bus": "扫描总线设备",
                 "read_all_tables": "读取全部表格",
                 "auto_read_all_tables": "自动读取全部表格",
                 "table": "表格",
@@ -36,6 +40,7 @@ class LanguageManager:
                 "field_name": "字段名",
                 "value": "值",
                 "update_time": "更新时间",
+                "last_changed": "最后变化",
                 "unit": "单位",
                 "type": "类型",
                 "description": "描述",
@@ -65,6 +70,10 @@ class LanguageManager:
                 "scan_success": "扫描成功",
                 "scan_failed": "扫描失败",
                 "start_scanning_models": "开始扫描模型",
+                "start_scanning_bus": "开始扫描总线设备",
+                "bus_devices_found": "发现SunSpec设备数",
+                "poll_bus_devices": "轮询总线所有设备",
+                "please_scan_bus_first": "请先扫描总线设备和模型地址",
                 "scan_complete": "扫描完成",
                 "success": "成功",
                 "failed": "失败",
@@ -81,11 +90,15 @@ class LanguageManager:
                 "slave_id": "Slave ID:",
                 "timeout_seconds": "Timeout(s):",
                 "connect_rtu": "Connect RTU",
+                "tcp_connection": "TCP Connection:",
+                "tcp_port": "Port:",
+                "connect_tcp": "Connect TCP",
                 "disconnect": "Disconnect",
                 "scan_base_address": "Scan SunSpec Base Address",
                 "current_base_address": "Current Base Address:",
                 "not_scanned": "Not Scanned",
                 "scan_model_address": "Scan Model Address",
+                "scan_bus": "Scan Bus Devices",
                 "read_all_tables": "Read All Tables",
                 "auto_read_all_tables": "Auto Read All Tables",
                 "table": "Table",
@@ -94,6 +107,7 @@ class LanguageManager:
                 "field_name": "Field Name",
                 "value": "Value",
                 "update_time": "Update Time",
+                "last_changed": "Last Changed",
                 "unit": "Unit",
                 "type": "Type",
                 "description": "Description",
@@ -123,6 +137,10 @@ class LanguageManager:
                 "scan_success": "Scan Success",
                 "scan_failed": "Scan Failed",
                 "start_scanning_models": "Start scanning models",
+                "start_scanning_bus": "Start scanning bus devices",
+                "bus_devices_found": "SunSpec devices found",
+                "poll_bus_devices": "Poll All Bus Devices",
+                "please_scan_bus_first": "Please scan bus devices and model addresses first",
                 "scan_complete": "Scan complete",
                 "success": "Success",
                 "failed": "Failed",
@@ -13,10 +13,22 @@ import os
 from functools import partial
 import sys
 from sunspec_protocol import SunSpecProtocol
+from sunspec_discovery import ModelChainScanner, BusScanner
+from request_queue import RequestQueue, PRIORITY_WRITE, PRIORITY_POLL
+from io_engine import IoEngine
+from poll_scheduler import PollScheduler
+from bus_scheduler import BusScheduler
+from device_map_cache import DeviceMapCache, SIGNATURE_COUNT, connection_identity, parse_signature
 from modbus_client import ModbusClient
-from gui_components import ConnectionFrame, DataTableFrame
+from gui_components import ConnectionFrame, VirtualTableFrame
 from language_manager import LanguageManager
 
+POLL_TICK_MS = 50  # 自动读取的调度检查周期
+BUS_POLL_INTERVAL = 1.0  # 多从站轮询周期（秒）
+BUS_REPORT_MS = 10000  # 多从站轮询速率报告周期
+CLOSE_TIMEOUT_MS = 3000  # 关闭窗口时等待当前总线请求完成的最长时间
+
+
 class SunSpecGUI:
     """SunSpec协议GUI界面"""
     
@@ -46,9 +58,19 @@ class SunSpecGUI:
         
         self.modbus_client = ModbusClient()
         self.sunspec_protocol = SunSpecProtocol()
+        self.device_map_cache = DeviceMapCache()
+        # 所有总线访问经请求队列在I/O线程中串行执行：写入 > 用户读取 > 后台轮询
+        # 结果由IoEngine交回Tk主线程，界面不会因串口/网络等待而卡住
+        self.request_queue = RequestQueue(self.modbus_client, log=self.log_message)
+        self.io_engine = IoEngine(self.root, self.request_queue)
+        # 自动读取按字段分组自适应轮询
+        self.poll_scheduler = PollScheduler(self.sunspec_protocol)
+        self.auto_read_after_id = None
+        self.closed = False  # 窗口关闭流程已完成
+        self.bus_inventory = []  # 总线扫描到的设备清单
+        self.bus_scheduler = None  # 多从站轮询
+        self.bus_report_after_id = None
         self.current_table = 802
-        self.auto_refresh = False
-        self.refresh_thread = None
         self.is_scan_base_addr = False
         self.is_scan_model_addr = False
         # 新增：日志文件相关
@@ -57,6 +79,7 @@ class SunSpecGUI:
         
         self.setup_gui()
         self.bind_events()
+        self.io_engine.start()
     def set_window_icon(self):
         """设置窗口图标"""
         try:
@@ -123,6 +146,11 @@ class SunSpecGUI:
         self.scan_model_btn = ttk.Button(scan_frame, text=self.language_manager.get_text("scan_model_address"), 
                   command=self.scan_models)
         self.scan_model_btn.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 扫描总线上的所有SunSpec设备
+        self.scan_bus_btn = ttk.Button(scan_frame, text=self.language_manager.get_text("scan_bus"),
+                  command=self.scan_bus)
+        self.scan_bus_btn.pack(side=tk.LEFT, padx=(10, 0))
         
 
         # 总控按钮（只保留读取全部）
@@ -139,13 +167,24 @@ class SunSpecGUI:
         )
         self.auto_read_all_check.pack(side=tk.LEFT, padx=(10, 0))
 
+        # 按总线扫描结果轮询所有设备
+        self.bus_poll_var = tk.BooleanVar(value=False)
+        self.bus_poll_check = ttk.Checkbutton(
+            btn_frame, text=self.language_manager.get_text("poll_bus_devices"), variable=self.bus_poll_var,
+            command=self.on_bus_poll_changed
+        )
+        self.bus_poll_check.pack(side=tk.LEFT, padx=(10, 0))
+
         # 创建标签页容器
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        # 标签页内容在第一次被选中时才创建
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         # 数据显示区 - 使用标签页
-        self.data_tables = {}
-        self.table_frames = {}
+        self.data_tables = {}  # 已创建内容的表格
+        self.table_frames = {}  # 所有表格标签页（断开连接时只隐藏，重连后复用）
+        self.pending_values = {}  # 内容尚未创建的表格收到的最新值，创建时一并显示
         self.read_all_btns = {}  # 保存每个表格的读全部按钮
 
         # 初始创建默认表格页
@@ -218,6 +257,7 @@ class SunSpecGUI:
         
         # 更新按钮文本
         self.connection_frame.connect_rtu_btn.configure(text=self.language_manager.get_text("connect_rtu"))
+        self.connection_frame.connect_tcp_btn.configure(text=self.language_manager.get_text("connect_tcp"))
         self.connection_frame.disconnect_btn.configure(text=self.language_manager.get_text("disconnect"))
 
     def update_scan_buttons_text(self):
@@ -226,6 +266,8 @@ class SunSpecGUI:
             self.scan_base_btn.configure(text=self.language_manager.get_text("scan_base_address"))
         if hasattr(self, 'scan_model_btn'):
             self.scan_model_btn.configure(text=self.language_manager.get_text("scan_model_address"))
+        if hasattr(self, 'scan_bus_btn'):
+            self.scan_bus_btn.configure(text=self.language_manager.get_text("scan_bus"))
         if hasattr(self, 'current_base_addr_label'):
             self.current_base_addr_label.configure(text=self.language_manager.get_text("current_base_address"))
         if hasattr(self, 'read_all_tables_btn'):
@@ -266,6 +308,8 @@ class SunSpecGUI:
             self.auto_save_check.configure(text=self.language_manager.get_text("auto_save_log"))
         if hasattr(self, 'auto_read_all_check'):
             self.auto_read_all_check.configure(text=self.language_manager.get_text("auto_read_all_tables"))
+        if hasattr(self, 'bus_poll_check'):
+            self.bus_poll_check.configure(text=self.language_manager.get_text("poll_bus_devices"))
 
     def update_data_tables_text(self):
         """更新数据表格的文本"""
@@ -281,6 +325,7 @@ class SunSpecGUI:
         """绑定事件"""
         # 绑定连接框架的按钮事件
         self.connection_frame.connect_rtu_btn.config(command=self.connect_rtu)
+        self.connection_frame.connect_tcp_btn.config(command=self.connect_tcp)
         self.connection_frame.disconnect_btn.config(command=self.disconnect)
         
         # 初始化按钮状态
@@ -294,9 +339,11 @@ class SunSpecGUI:
         self.connection_frame.update_buttons_state(is_connected)
 
     def create_table_tab(self, table_id):
-        """创建单个表格标签页"""
+        """创建单个表格标签页（只建空白页，内容在第一次选中时创建）"""
         if table_id in self.table_frames:
-            return  # 已存在，不重复创建
+            # 已存在（可能在断开连接时被隐藏），恢复显示即可
+            self.notebook.add(self.table_frames[table_id])
+            return
         
         # 检查模型是否已加载
         if table_id not in self.sunspec_protocol.models:
@@ -313,6 +360,23 @@ class SunSpecGUI:
         tab_frame = ttk.Frame(self.notebook)
         self.notebook.add(tab_frame, text=f"{self.language_manager.get_text('table')}{table_id}({self.language_manager.get_text('addr')}: -)")
         self.table_frames[table_id] = tab_frame
+        self.pending_values[table_id] = {}
+        if self.notebook.select() == str(tab_frame):
+            self.build_table_tab(table_id)
+
+    def on_tab_changed(self, event=None):
+        """切换到内容尚未创建的标签页时创建内容"""
+        selected = self.notebook.select()
+        for table_id, tab_frame in self.table_frames.items():
+            if str(tab_frame) == selected:
+                self.build_table_tab(table_id)
+                break
+
+    def build_table_tab(self, table_id):
+        """创建标签页内容（读全部按钮和数据表格），已创建时不重复创建"""
+        if table_id in self.data_tables:
+            return
+        tab_frame = self.table_frames[table_id]
 
         # 按钮区（只保留读全部）
         btn_frame = ttk.Frame(tab_frame)
@@ -322,36 +386,26 @@ class SunSpecGUI:
         read_all_btn.pack(side=tk.LEFT)
         self.read_all_btns[table_id] = read_all_btn  # 保存按钮引用
 
-        # 内容区+滚动条
-        content_frame = ttk.Frame(tab_frame)
-        content_frame.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
-
-        canvas = tk.Canvas(content_frame)
-        scrollbar = ttk.Scrollbar(content_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-
-        canvas_window_id = canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e, c=canvas: c.configure(scrollregion=c.bbox("all"))
-        )
-        
-        def on_canvas_configure(event, canvas=canvas, window_id=canvas_window_id, sf=scrollable_frame):
-            canvas.itemconfig(window_id, width=event.width)
-            sf.configure(width=event.width)
-            canvas.configure(scrollregion=canvas.bbox("all"))
-        
-        canvas.bind('<Configure>', on_canvas_configure)
-        canvas.configure(yscrollcommand=scrollbar.set)
+        # 内容区：Treeview表格只绘制可见行，自带滚动条
+        dt = VirtualTableFrame(tab_frame, table_id, self.sunspec_protocol,
+                               self.modbus_client, main_window=self, language_manager=self.language_manager)
+        dt.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        self.data_tables[table_id] = dt
+        values = self.pending_values.pop(table_id, None)
+        if values:
+            dt.display_data(values)
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+    def visible_tables(self):
+        """当前显示的（未被隐藏的）表格ID"""
+        return [table_id for table_id, tab_frame in self.table_frames.items()
+                if self.notebook.tab(tab_frame, "state") != "hidden"]
 
-        dt = DataTableFrame(scrollable_frame, table_id, self.sunspec_protocol, 
-                          self.modbus_client, main_window=self, language_manager=self.language_manager)
-        dt.pack(fill=tk.BOTH, expand=True)
-        self.data_tables[table_id] = dt
+    def display_table_data(self, table_id, values):
+        """显示表格数据；内容尚未创建时先保存，创建时再显示"""
+        if table_id in self.data_tables:
+            self.data_tables[table_id].display_data(values)
+        elif table_id in self.table_frames:
+            self.pending_values.setdefault(table_id, {}).update(values)
 
     def get_default_log_file(self):
         """获取默认日志文件路径"""
@@ -418,7 +472,10 @@ class SunSpecGUI:
         import datetime
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}\n"
-        
+        # I/O线程不能直接操作Tk控件，由主线程写入
+        self.io_engine.post(self.write_log_entry, log_entry)
+
+    def write_log_entry(self, log_entry):
         # 显示在GUI中
         self.log_text.insert(tk.END, log_entry)
         self.log_text.see(tk.END)
@@ -454,36 +511,83 @@ class SunSpecGUI:
                 self.log_text.insert(tk.END, error_msg)
 
     def connect_rtu(self):
-        """连接RTU Modbus"""
+        """连接RTU Modbus（在I/O线程中打开串口，完成后更新界面）"""
         port = self.connection_frame.rtu_port_var.get()
         baudrate = int(self.connection_frame.baudrate_var.get())
         slave_id = int(self.connection_frame.slave_id_var.get())
         timeout = int(self.connection_frame.timeout_var.get())
         
-        if self.modbus_client.connect_rtu(port, baudrate, timeout=timeout):
-            # 设置全局slave_id
+        self.submit_connect(lambda client: client.connect_rtu(port, baudrate, timeout=timeout),
+                            "RTU", port, slave_id)
+
+    def connect_tcp(self):
+        """连接Modbus TCP / RTU over TCP（在I/O线程中建立连接，完成后更新界面）"""
+        host = self.connection_frame.tcp_host_var.get().strip()
+        port = int(self.connection_frame.tcp_port_var.get())
+        mode = self.connection_frame.tcp_mode_var.get()
+        slave_id = int(self.connection_frame.slave_id_var.get())
+        timeout = int(self.connection_frame.timeout_var.get())
+        
+        if mode == "RTU over TCP":
+            connect = lambda client: client.connect_rtu_over_tcp(host, port, timeout=timeout)
+        else:
+            connect = lambda client: client.connect_tcp(host, port, timeout=timeout)
+        self.submit_connect(connect, mode, f"{host}:{port}", slave_id)
+
+    def submit_connect(self, connect, mode, target, slave_id):
+        """
+        提交连接请求，连接超时等待不阻塞界面线程
+        与断开请求同为写入优先级，按点击顺序执行
+        """
+        self.modbus_client.set_log_callback(self.log_message)
+        # 连接进行中禁用连接/断开按钮，避免重复提交
+        self.connection_frame.update_buttons_state(False, busy=True)
+        self.status_var.set(f"正在连接 {target}...")
+        self.io_engine.submit(connect, partial(self.on_connected, mode, target, slave_id), PRIORITY_WRITE,
+                              on_dropped=self.update_connection_buttons_state)
+
+    def on_connected(self, mode, target, slave_id, ok):
+        if self.closed:
+            return
+        if ok:
+            # 设置全局slave_id（TCP下即单元标识符）
             self.modbus_client.slave_id = slave_id
-            
-            self.modbus_client.set_log_callback(self.log_message)
-            self.status_var.set(f"RTU连接成功: {port}, 从站ID: {slave_id}")
-            self.log_message(f"RTU连接成功: {port}, 从站ID: {slave_id}")
-            messagebox.showinfo(self.language_manager.get_text("connection_success"), f"已连接到 {port}, 从站ID: {slave_id}")
+            self.status_var.set(f"{mode}连接成功: {target}, 从站ID: {slave_id}")
+            self.log_message(f"{mode}连接成功: {target}, 从站ID: {slave_id}")
+            messagebox.showinfo(self.language_manager.get_text("connection_success"), f"已连接到 {target}, 从站ID: {slave_id}")
             
             # 更新按钮状态
             self.update_connection_buttons_state()
+            # 已知设备直接使用缓存的地址映射
+            self.restore_device_map()
         else:
-            self.status_var.set("RTU连接失败")
-            self.log_message(f"RTU连接失败: {port}")
-            messagebox.showerror(self.language_manager.get_text("connection_failed"), f"无法连接到 {port}")
+            self.update_connection_buttons_state()
+            self.status_var.set(f"{mode}连接失败")
+            self.log_message(f"{mode}连接失败: {target}")
+            messagebox.showerror(self.language_manager.get_text("connection_failed"), f"无法连接到 {target}")
 
     def disconnect(self):
-        """断开连接"""
-        self.modbus_client.disconnect()
-        self.status_var.set(self.language_manager.get_text("disconnected"))
-        self.log_message(self.language_manager.get_text("disconnected"))
+        """断开连接（在I/O线程中排队执行，完成后更新界面）"""
         #取消勾选自动读取
         self.auto_read_all_var.set(False)
         self.on_auto_read_all_changed()
+        self.bus_poll_var.set(False)
+        self.stop_bus_poll()
+        # 丢弃排队的轮询，断开请求以最高优先级排队，只需等待当前请求完成
+        self.request_queue.drop_polls()
+        self.submit_disconnect(self.on_disconnected)
+
+    def submit_disconnect(self, on_done):
+        """
+        提交断开连接请求，完成（或被丢弃）后在主线程中调用on_done()
+        连接请求同样在I/O线程中按提交顺序执行，排在前面的连接完成后才会断开
+        """
+        self.io_engine.submit(lambda client: client.disconnect(), lambda result: on_done(),
+                              PRIORITY_WRITE, on_dropped=on_done)
+
+    def on_disconnected(self):
+        self.status_var.set(self.language_manager.get_text("disconnected"))
+        self.log_message(self.language_manager.get_text("disconnected"))
         
         # 清除扫描到的基地址和模型地址
         self.clear_scanned_addresses()
@@ -503,9 +607,10 @@ class SunSpecGUI:
         # 清除基地址显示
         self.base_addr_var.set(self.language_manager.get_text("not_scanned"))
         
-        # 清除协议中的基地址
+        # 清除协议中的基地址和模型地址
         if hasattr(self.sunspec_protocol, 'base_address'):
             self.sunspec_protocol.base_address = None
+        self.sunspec_protocol.clear_model_addresses()
             
         # 清除模型地址映射
         if hasattr(self, 'model_base_addrs'):
@@ -514,23 +619,24 @@ class SunSpecGUI:
         self.log_message("已清除扫描到的基地址和模型地址")
     
     def reinitialize_table_pages(self):
-        """重新初始化表格页面"""
-        # 清除所有现有的表格页
-        for i in range(self.notebook.index("end")):
-            self.notebook.forget(0)
-            
-        # 清除表格相关的数据结构
-        self.data_tables.clear()
-        self.table_frames.clear()
-        self.read_all_btns.clear()
+        """重新初始化表格页面：隐藏扫描出的表格页并清空数据，页面和控件保留到重连后复用"""
+        for table_id, tab_frame in self.table_frames.items():
+            if table_id not in [802, 805, 899]:
+                self.notebook.hide(tab_frame)
+            if table_id in self.data_tables:
+                self.data_tables[table_id].clear_data()
+            else:
+                self.pending_values[table_id] = {}
         
-        # 重新创建默认表格页（802, 805, 899）
+        # 默认表格页（802, 805, 899）保持显示
         for table_id in [802, 805, 899]:
             self.create_table_tab(table_id)
+        self.update_table_titles()
             
         self.log_message("已重新初始化表格页面")
 
     def read_all_tables(self):
+        """读取全部表格（在I/O线程中执行，结果回到主线程显示）"""
         if not self.modbus_client.is_connected():
             messagebox.showwarning(self.language_manager.get_text("warning"), 
                                  self.language_manager.get_text("please_connect_first"))
@@ -539,14 +645,46 @@ class SunSpecGUI:
             messagebox.showwarning(self.language_manager.get_text("warning"), 
                                     self.language_manager.get_text("please_scan_model_addr_first"))
             return
-        self.log_message(self.language_manager.get_text("start_reading_all"))
         
-        # 读取所有已创建的表格页对应的表格
-        for table_id in self.data_tables.keys():
-            self.read_table(table_id)
-            
+        table_ids = []
+        for table_id in self.visible_tables():
+            if table_id not in self.model_base_addrs:
+                self.log_message(f"表格{table_id}未扫描到地址，跳过")
+                continue
+            table_ids.append(table_id)
+        
+        self.log_message(self.language_manager.get_text("start_reading_all"))
+        self.io_engine.submit(partial(self.read_tables_snapshot, table_ids), self.on_all_tables_read)
+
+    def on_all_tables_read(self, results):
+        if results is None:
+            self.log_message("读取全部表格失败")
+            return
+        for table_id, data in results.items():
+            self.show_table_data(table_id, data)
         self.log_message(self.language_manager.get_text("all_tables_read_complete"))
 
+    def read_tables_snapshot(self, table_ids, modbus_client):
+        """一次读取并解析全部表格（I/O线程）"""
+        # 优先整机快照：从基地址到结束标记按最大长度分段读取，再切分给各模型
+        results = self.sunspec_protocol.snapshot_device(modbus_client)
+        if results is None:
+            # 无法确定映射范围时按表格规划读取：相邻模型合并、超长模型按字段边界分段
+            # （TCP连接下各请求流水线并发，串口下顺序执行）
+            results = self.sunspec_protocol.read_tables(modbus_client, table_ids)
+        return {table_id: self.decode_table(table_id, results.get(table_id)) for table_id in table_ids}
+
+    def read_table_data(self, table_id, modbus_client):
+        """读取并解析一个表格（I/O线程）"""
+        data = self.sunspec_protocol.read_tables(modbus_client, [table_id]).get(table_id)
+        return self.decode_table(table_id, data)
+
+    def decode_table(self, table_id, data):
+        """解析寄存器数据，返回解析结果；读取失败返回None，解析失败返回{}"""
+        if not data:
+            return None
+        return self.sunspec_protocol.parse_table_data(table_id, data) or {}
+
     def read_table(self, table_id):
         # 检查是否已连接
         if not self.modbus_client.is_connected():
@@ -573,17 +711,17 @@ class SunSpecGUI:
             self.log_message(f"获取表格{table_id}信息失败")
             return
             
-        length = table_info["length"]
-        data = self.modbus_client.read_holding_registers(base_addr, length)
-        if data:
-            parsed = self.sunspec_protocol.parse_table_data(table_id, data)
-            if parsed and table_id in self.data_tables:
-                self.data_tables[table_id].display_data(parsed)
-                self.log_message(f"表格{table_id}读取成功")
-            else:
-                self.log_message(f"表格{table_id}解析失败")
-        else:
+        self.io_engine.submit(partial(self.read_table_data, table_id), partial(self.show_table_data, table_id))
+
+    def show_table_data(self, table_id, parsed):
+        """显示一个表格的解析结果（None表示读取失败，空字典表示解析失败）"""
+        if parsed is None:
             self.log_message(f"表格{table_id}读取失败")
+        elif parsed:
+            self.display_table_data(table_id, parsed)
+            self.log_message(f"表格{table_id}读取成功")
+        else:
+            self.log_message(f"表格{table_id}解析失败")
 
     def scan_base_address(self):
         """扫描SunSpec协议基地址"""
@@ -592,10 +730,13 @@ class SunSpecGUI:
                                  self.language_manager.get_text("please_connect_first"))
             return
         self.log_message(self.language_manager.get_text("start_scanning_base"))
+        self.io_engine.submit(self.probe_base_address, self.on_base_address_scanned)
+
+    def probe_base_address(self, modbus_client):
+        """依次探测候选基地址（I/O线程），返回找到的基地址，未找到返回None"""
         candidate_addrs = [0, 40000, 50000]
-        found = False
         for addr in candidate_addrs:
-            data = self.modbus_client.read_holding_registers(addr, 2)
+            data = modbus_client.read_holding_registers(addr, 2)
             if data and len(data) == 2:
                 bytes_data = (data[0] & 0xFF).to_bytes(1, 'big') + ((data[0] >> 8) & 0xFF).to_bytes(1, 'big') + \
                            (data[1] & 0xFF).to_bytes(1, 'big') + ((data[1] >> 8) & 0xFF).to_bytes(1, 'big')
@@ -604,74 +745,152 @@ class SunSpecGUI:
                     hex_str = ' '.join([f"{b:02X}" for b in bytes_data])
                     self.log_message(f"地址{addr}内容: {ascii_str} (hex: {hex_str})")
                     if ascii_str == "SunS":
-                        self.sunspec_protocol.base_address = addr
-                        self.base_addr_var.set(str(addr))
-                        self.log_message(f"发现SunSpec基地址: {addr}")
-                        messagebox.showinfo(self.language_manager.get_text("scan_success"), 
-                                          f"{self.language_manager.get_text('found_sunspec_base')}: {addr}")
-                        found = True
-                        self.scan_base_address = True
-                        break
+                        return addr
                 except Exception as e:
                     self.log_message(f"地址{addr}解析失败: {e}")
-        if not found:
+        return None
+
+    def on_base_address_scanned(self, addr):
+        if addr is not None:
+            self.sunspec_protocol.base_address = addr
+            self.base_addr_var.set(str(addr))
+            self.log_message(f"发现SunSpec基地址: {addr}")
+            messagebox.showinfo(self.language_manager.get_text("scan_success"), 
+                              f"{self.language_manager.get_text('found_sunspec_base')}: {addr}")
+            self.is_scan_base_addr = True
+        else:
             self.base_addr_var.set(self.language_manager.get_text("not_scanned"))
             self.log_message(self.language_manager.get_text("not_found_sunspec_base"))
             messagebox.showerror(self.language_manager.get_text("scan_failed"), 
                                self.language_manager.get_text("not_found_sunspec_base"))
 
+    def scan_bus(self):
+        """扫描总线：遍历从站ID和候选基地址，列出所有SunSpec设备"""
+        if not self.modbus_client.is_connected():
+            messagebox.showwarning(self.language_manager.get_text("warning"), 
+                                 self.language_manager.get_text("please_connect_first"))
+            return
+        self.log_message(self.language_manager.get_text("start_scanning_bus"))
+        scanner = BusScanner(self.modbus_client, log=self.log_message)
+        self.submit_bus_scan_step(scanner)
+
+    def submit_bus_scan_step(self, scanner):
+        """每次只提交一批从站的探测，写入和断开连接最多等待一批请求"""
+        self.io_engine.submit(lambda client: scanner.step(), partial(self.on_bus_scan_step, scanner))
+
+    def on_bus_scan_step(self, scanner, more):
+        if more and self.modbus_client.is_connected():
+            self.submit_bus_scan_step(scanner)
+        elif more is False:
+            self.on_bus_scanned(scanner, scanner.inventory)
+        else:
+            self.log_message("总线扫描已中止")
+
+    def on_bus_scanned(self, scanner, inventory):
+        for device in inventory:
+            self.log_message(f"从站{device['slave_id']}: 基地址 {device['base_address']}, "
+                             f"厂商: {device['manufacturer']}, 型号: {device['model']}, "
+                             f"序列号: {device['serial_number']}")
+        self.log_message(f"总线扫描请求数: {scanner.request_count}")
+        self.bus_inventory = inventory
+        messagebox.showinfo(self.language_manager.get_text("scan_complete"),
+                            f"{self.language_manager.get_text('bus_devices_found')}: {len(inventory)}\n" +
+                            "\n".join(f"ID {d['slave_id']} @ {d['base_address']}  {d['serial_number']}"
+                                      for d in inventory))
+
     def scan_models(self):
         """扫描所有SunSpec模型，找到802/805/899的起始地址"""
         if not self.modbus_client.is_connected():
             messagebox.showwarning(self.language_manager.get_text("warning"), 
                                  self.language_manager.get_text("please_connect_first"))
             return
-        if self.scan_base_address == False:
+        if not self.is_scan_base_addr:
             messagebox.showwarning(self.language_manager.get_text("warning"), 
                                     self.language_manager.get_text("please_scan_base_addr_first"))
             return
         base_addr = self.sunspec_protocol.base_address
-        addr = base_addr + 2  # Skip "SunS" (ID and Length of SunSpec Common Model)
-        model_map = {}
         self.log_message(f"{self.language_manager.get_text('start_scanning_models')}，基地址: {base_addr}")
 
-        while True:
-            regs = self.modbus_client.read_holding_registers(addr, 2)
-            if not regs or len(regs) < 2:
-                self.log_message(f"读取模型ID/LEN失败，地址: {addr}")
-                break
-            model_id, model_len = regs[0], regs[1]
-            self.log_message(f"模型ID: {model_id} LEN: {model_len} @ {addr}")
+        self.io_engine.submit(partial(self.discover_model_chain, base_addr), self.on_models_scanned)
 
-            if model_id == 0xFFFF and model_len == 0:
-                self.is_scan_model_addr = True
-                self.log_message("模型链表结束")
-                break
+    def discover_model_chain(self, base_addr, modbus_client):
+        """扫描模型链（I/O线程），返回 (model_map, model_lengths, chain_end)"""
+        # 按窗口预读，一次读取可解析多个模型头
+        scanner = ModelChainScanner(modbus_client.read_holding_registers, log=self.log_message)
+        result = scanner.scan(base_addr)
+        self.log_message(f"模型链扫描读取次数: {scanner.read_count}")
+        return result
 
-            model_map[model_id] = addr
-            self.sunspec_protocol.set_model_base_address(model_id, addr)
+    def on_models_scanned(self, result):
+        if result is None:
+            self.log_message("模型扫描失败")
+            return
+        model_map, model_lengths, chain_end = result
+        self.log_message(f"{self.language_manager.get_text('scan_complete')}，找到模型: {list(model_map.keys())}")
+        self.apply_model_map(model_map, model_lengths, chain_end)
+        if chain_end is not None:
+            self.save_device_map()
 
-            addr = addr + 2 + model_len
+    def apply_model_map(self, model_map, model_lengths, chain_end):
+        """应用扫描（或缓存）得到的模型地址表，并创建对应的表格页"""
+        for model_id, addr in model_map.items():
+            self.sunspec_protocol.set_model_base_address(model_id, addr, model_lengths[model_id])
+        if chain_end is not None:
+            self.is_scan_model_addr = True
+            self.sunspec_protocol.model_chain_end = chain_end
 
         self.model_base_addrs = model_map
-        self.log_message(f"{self.language_manager.get_text('scan_complete')}，找到模型: {list(model_map.keys())}")
+        self.model_lengths = model_lengths
 
         # 先重新加载模型，只加载扫描到的模型
         self.sunspec_protocol.load_models(available_models=list(model_map.keys()))
 
         # 然后为新发现的模型创建表格页（只对有JSON文件的模型）
         for model_id in model_map.keys():
-            if model_id not in self.table_frames:
-                # 检查模型是否成功加载（即有对应的JSON文件）
-                if model_id in self.sunspec_protocol.models:
-                    self.create_table_tab(model_id)
-                    self.log_message(f"创建新表格页: 模型{model_id}")
-                else:
-                    self.log_message(f"跳过模型{model_id}：未找到对应的JSON文件")
+            if model_id in self.table_frames:
+                # 断开连接时隐藏的表格页直接恢复
+                self.create_table_tab(model_id)
+            # 检查模型是否成功加载（即有对应的JSON文件）
+            elif model_id in self.sunspec_protocol.models:
+                self.create_table_tab(model_id)
+                self.log_message(f"创建新表格页: 模型{model_id}")
+            else:
+                self.log_message(f"跳过模型{model_id}：未找到对应的JSON文件")
 
         # 更新标签页标题显示地址
         self.update_table_titles()
 
+    def save_device_map(self):
+        """把基地址和模型地址表按设备身份保存到缓存"""
+        base_addr = self.sunspec_protocol.base_address
+        identity = connection_identity(self.modbus_client)
+        model_map = dict(self.model_base_addrs)
+        model_lengths = dict(self.model_lengths)
+        chain_end = self.sunspec_protocol.model_chain_end
+
+        def save(modbus_client):
+            signature = modbus_client.read_holding_registers(base_addr, SIGNATURE_COUNT)
+            if self.device_map_cache.save(identity, signature, base_addr, model_map, model_lengths, chain_end):
+                self.log_message(f"已缓存设备映射: {identity}, 序列号: {parse_signature(signature)}")
+        self.io_engine.submit(save)
+
+    def restore_device_map(self):
+        """连接后用一次读取校验设备映射缓存，命中时跳过基地址和模型扫描"""
+        identity = connection_identity(self.modbus_client)
+        self.io_engine.submit(
+            lambda client: self.device_map_cache.lookup(identity, client.read_holding_registers),
+            partial(self.on_device_map_restored, identity))
+
+    def on_device_map_restored(self, identity, cached):
+        if cached is None:
+            return
+        base_addr, model_map, model_lengths, chain_end, serial_number = cached
+        self.sunspec_protocol.base_address = base_addr
+        self.base_addr_var.set(str(base_addr))
+        self.is_scan_base_addr = True
+        self.log_message(f"设备映射缓存命中: {identity}, 序列号: {serial_number}, 基地址: {base_addr}, "
+                         f"模型: {list(model_map.keys())}")
+        self.apply_model_map(model_map, model_lengths, chain_end)
 
     def on_auto_read_all_changed(self):
         """自动读取全部表格勾选框状态改变时的处理"""
@@ -689,27 +908,118 @@ class SunSpecGUI:
             messagebox.showwarning(self.language_manager.get_text("warning"), 
                                     self.language_manager.get_text("please_scan_model_addr_first"))
             return 
+        self.stop_auto_read_all()
         self._auto_read_all_running = True
         self.schedule_auto_read_all()
 
     def stop_auto_read_all(self):
         """停止自动读取全部表格"""
         self._auto_read_all_running = False
+        if self.auto_read_after_id is not None:
+            self.root.after_cancel(self.auto_read_after_id)
+            self.auto_read_after_id = None
 
     def schedule_auto_read_all(self):
-        """调度自动读取全部表格"""
-        if getattr(self, "_auto_read_all_running", False):
-            self.read_all_tables()
-            # 5秒后再次调用
-            self.root.after(5000, self.schedule_auto_read_all)
+        """按字段分组建立自适应轮询，取代固定周期读取全部表格"""
+        table_ids = [table_id for table_id in self.visible_tables() if table_id in self.model_base_addrs]
+        self.poll_scheduler.configure(table_ids)
+        self.poll_scheduler.start()
+        self.log_message(f"自动读取: {len(self.poll_scheduler.groups)}个轮询分组，"
+                         f"快速点{self.poll_scheduler.intervals['fast'] * 1000:.0f}ms，"
+                         f"其余{self.poll_scheduler.intervals['normal']:.0f}s，静态点只读一次")
+        self.poll_tick()
+
+    def poll_tick(self):
+        """提交到期的轮询分组"""
+        self.auto_read_after_id = None
+        if not getattr(self, "_auto_read_all_running", False):
+            return
+        if self.modbus_client.is_connected():
+            for group in self.poll_scheduler.due_groups():
+                # 下一次到期前还没轮到执行的请求已经过时，直接丢弃
+                deadline = time.monotonic() + self.poll_scheduler.effective_interval(group)
+                self.io_engine.submit(partial(self.poll_scheduler.poll, group),
+                                      partial(self.on_group_polled, group),
+                                      PRIORITY_POLL, deadline,
+                                      on_dropped=partial(self.poll_scheduler.record_dropped, group))
+        self.auto_read_after_id = self.root.after(POLL_TICK_MS, self.poll_tick)
+
+    def on_group_polled(self, group, result):
+        # 轮询函数抛出异常时result为None，同样按失败记录，分组才能继续轮询
+        values, elapsed = result if result is not None else (None, 0.0)
+        self.poll_scheduler.record(group, values is not None, elapsed)
+        if values is None:
+            self.log_message(f"表格{group.table_id}轮询失败（{group.kind}）")
+        elif values:
+            # 只包含值发生变化的字段
+            self.display_table_data(group.table_id, values)
+
+    def on_bus_poll_changed(self):
+        """轮询总线所有设备勾选框状态改变时的处理"""
+        if self.bus_poll_var.get():
+            self.start_bus_poll()
+        else:
+            self.stop_bus_poll()
+
+    def start_bus_poll(self):
+        """按总线扫描到的设备清单，以固定周期轮询每台设备的已扫描模型"""
+        if not self.bus_inventory or not self.is_scan_model_addr:
+            self.bus_poll_var.set(False)
+            messagebox.showwarning(self.language_manager.get_text("warning"),
+                                   self.language_manager.get_text("please_scan_bus_first"))
+            return
+        self.stop_bus_poll()
+        self.bus_scheduler = BusScheduler(self.request_queue)
+        for device in self.bus_inventory:
+            for model_id in self.model_base_addrs:
+                self.bus_scheduler.add_model_job(device['slave_id'], self.sunspec_protocol, model_id,
+                                                 BUS_POLL_INTERVAL, base_address=device['base_address'])
+        self.bus_scheduler.start()
+        report = self.bus_scheduler.report()
+        self.log_message(f"多从站轮询: {len(report['jobs'])}个任务，周期{BUS_POLL_INTERVAL:.0f}s，"
+                         f"预计总线负载{report['bus_load'] * 100:.0f}%")
+        self.bus_report_after_id = self.root.after(BUS_REPORT_MS, self.report_bus_poll)
+
+    def stop_bus_poll(self):
+        if self.bus_report_after_id is not None:
+            self.root.after_cancel(self.bus_report_after_id)
+            self.bus_report_after_id = None
+        if self.bus_scheduler is not None:
+            self.bus_scheduler.stop()
+            self.bus_scheduler = None
+
+    def report_bus_poll(self):
+        """记录各任务请求速率与实际速率"""
+        self.bus_report_after_id = None
+        if self.bus_scheduler is None:
+            return
+        report = self.bus_scheduler.report()
+        self.log_message(f"多从站轮询: 总线负载{report['bus_load'] * 100:.0f}%，周期放大{report['stretch']:.2f}倍")
+        for job in report['jobs']:
+            self.log_message(f"  {job['name']}: {job['achieved_hz']:.2f}/{job['requested_hz']:.2f}Hz，"
+                             f"失败{job['failures']}（退避{job['backoff']}倍），跳过{job['skipped']}，"
+                             f"耗时{job['cost_ms']:.0f}ms")
+        self.bus_report_after_id = self.root.after(BUS_REPORT_MS, self.report_bus_poll)
 
     def run(self):
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.root.mainloop()
 
     def on_closing(self):
+        """关闭窗口：先隐藏窗口，断开连接排队执行完成后退出，不阻塞界面线程"""
         self.stop_auto_read_all()
-        self.modbus_client.disconnect()
+        self.stop_bus_poll()
+        self.request_queue.drop_polls()
+        self.root.withdraw()
+        self.submit_disconnect(self.finish_closing)
+        # 当前请求迟迟不结束时（如设备不响应）不再等待，I/O线程为守护线程
+        self.root.after(CLOSE_TIMEOUT_MS, self.finish_closing)
+
+    def finish_closing(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.io_engine.stop(timeout=0)
         self.root.destroy()
 
 def main():
@@ -4,62 +4,157 @@
 Modbus客户端模块
 """
 
-import serial
-import time
+import struct
+from modbus_crc import get_crc16_function
+from read_planner import ReadPlan, MAX_READ_REGISTERS
+from modbus_transport import (
+    TIMING_FRAME, SerialRtuTransport, TcpTransport, RtuOverTcpTransport
+)
+
+
+def build_read_request(function, address, count):
+    """
+    组读请求PDU: [func][addr_hi][addr_lo][cnt_hi][cnt_lo]
+    返回(pdu, 正常响应PDU长度)，响应PDU为1+1+count*2字节
+    """
+    return struct.pack('>BHH', function, address, count), 2 + count * 2
+
+
+def build_write_register_request(address, value):
+    """组单寄存器写请求PDU（功能码0x06），响应为请求回显"""
+    return struct.pack('>BHH', 0x06, address, value & 0xFFFF), 5
+
+
+def build_write_registers_request(address, values):
+    """组多寄存器写请求PDU（功能码0x10）"""
+    count = len(values)
+    pdu = struct.pack('>BHHB', 0x10, address, count, count * 2)
+    pdu += b''.join(struct.pack('>H', v & 0xFFFF) for v in values)
+    return pdu, 5
+
+
+def decode_registers(resp, count):
+    """从读响应PDU中取出count个uint16寄存器值"""
+    reg_bytes = resp[2:2 + count * 2]
+    return [reg_bytes[i] << 8 | reg_bytes[i+1] for i in range(0, len(reg_bytes), 2)]
+
+
+def check_response(pdu, resp, resp_pdu_len):
+    """响应PDU功能码与长度匹配时返回resp，否则返回None（含异常响应）"""
+    if not resp or len(resp) < resp_pdu_len or resp[0] != pdu[0]:
+        return None
+    return resp
+
 
 class ModbusClient:
     def __init__(self):
-        self.ser = None
+        self.transport = None
+        self.ser = None  # 串口RTU连接时指向底层serial.Serial，兼容旧代码
         self.connected = False
         self.slave_id = 1
         self.timeout = 1  # 秒
         self.log_callback = None
+        self.crc16 = get_crc16_function()
+        self.pipeline_window = 4  # TCP流水线最大未完成请求数
+        self.request_timeout = None  # 流水线中单个请求的超时（秒），None时使用连接超时
+        self.read_gap_tolerance = 8  # 合并读取时允许顺带读取的空隙寄存器数
+
+    def set_crc_backend(self, backend=None):
+        """切换CRC16后端: 'bitwise' / 'table' / 'accelerated'，None为自动选择"""
+        self.crc16 = get_crc16_function(backend)
+        if hasattr(self.transport, 'set_crc_backend'):
+            self.transport.set_crc_backend(backend)
 
     def set_log_callback(self, callback):
         self.log_callback = callback
+        if self.transport:
+            self.transport.log_callback = callback
 
-    def connect_rtu(self, port, baudrate=9600, timeout=1):
+    def connect(self, transport):
+        """使用指定的传输层建立连接"""
+        self.disconnect()
         try:
-            self.ser = serial.Serial(port=port, baudrate=baudrate, bytesize=8, parity='N', stopbits=1, timeout=timeout)
-            self.connected = self.ser.is_open
-            self.timeout = timeout
-            return self.connected
+            transport.log_callback = self.log_callback
+            self.connected = bool(transport.open())
         except Exception as e:
-            print(f"串口连接失败: {e}")
+            print(f"连接失败: {e}")
             self.connected = False
-            return False
+        if self.connected:
+            self.transport = transport
+            self.timeout = transport.timeout
+            self.ser = getattr(transport, 'ser', None)
+        return self.connected
+
+    def connect_rtu(self, port, baudrate=9600, timeout=1, timing_mode=TIMING_FRAME):
+        return self.connect(SerialRtuTransport(port, baudrate, timeout, timing_mode))
+
+    def connect_tcp(self, host, port=502, timeout=1):
+        return self.connect(TcpTransport(host, port, timeout))
+
+    def connect_rtu_over_tcp(self, host, port=502, timeout=1):
+        return self.connect(RtuOverTcpTransport(host, port, timeout))
 
     def disconnect(self):
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        if self.transport:
+            self.transport.close()
+        self.transport = None
+        self.ser = None
         self.connected = False
 
     def is_connected(self):
-        return self.connected and self.ser and self.ser.is_open
+        return bool(self.connected and self.transport and self.transport.is_open())
 
     def calculate_crc16(self, data: bytes):
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return crc & 0xFFFF
+        return self.crc16(data)
 
     def send_and_recv(self, request: bytes, resp_len: int):
+        """直接收发原始RTU帧（仅RTU类传输支持）"""
+        if not self.is_connected() or not hasattr(self.transport, 'send_and_recv'):
+            return None
+        return self.transport.send_and_recv(request, resp_len)
+
+    def execute(self, pdu: bytes, resp_pdu_len: int):
+        """
+        通过当前传输层执行一次请求
+        返回功能码匹配的响应PDU，异常响应或失败返回None
+        """
         if not self.is_connected():
             return None
-        self.ser.reset_input_buffer()
-        self.ser.write(request)
-        if self.log_callback:
-            self.log_callback("发送：" + " ".join(f"{b:02X}" for b in request))
-        time.sleep(0.05)
-        response = self.ser.read(resp_len)
-        if self.log_callback:
-            self.log_callback("接收：" + " ".join(f"{b:02X}" for b in response))
-        return response
+        resp = self.transport.transact(self.slave_id, pdu, resp_pdu_len)
+        return check_response(pdu, resp, resp_pdu_len)
+
+    def supports_pipelining(self):
+        return bool(self.transport and self.transport.supports_pipelining)
+
+    def execute_many(self, requests):
+        """
+        批量执行请求，requests为[(pdu, resp_pdu_len), ...]
+        TCP传输下按pipeline_window并发在途，其它传输顺序执行
+        """
+        if not self.is_connected():
+            return [None] * len(requests)
+        responses = self.transport.transact_many(
+            [(self.slave_id, pdu, resp_pdu_len) for pdu, resp_pdu_len in requests],
+            window=self.pipeline_window, timeout=self.request_timeout)
+        return [check_response(pdu, resp, resp_pdu_len)
+                for (pdu, resp_pdu_len), resp in zip(requests, responses)]
+
+    def transact_many(self, requests, timeout=None):
+        """
+        批量执行可指定从站的请求，requests为[(slave_id, pdu, resp_pdu_len), ...]
+        返回原始响应PDU列表（异常响应原样返回，无响应为None），用于区分"设备不在线"与"地址无效"
+        timeout: 本批请求的专用超时，None时使用连接超时
+        """
+        if not self.is_connected():
+            return [None] * len(requests)
+        transport = self.transport
+        saved_timeout = transport.timeout
+        if timeout is not None:
+            transport.timeout = timeout
+        try:
+            return transport.transact_many(requests, window=self.pipeline_window, timeout=timeout)
+        finally:
+            transport.timeout = saved_timeout
 
     def parse_modbus_data(self, data_bytes, data_types=None):
         """
@@ -162,121 +257,48 @@ class ModbusClient:
         return result
 
     def read_holding_registers(self, address, count, data_types=None):
-        # 组帧: [slave][0x03][addr_hi][addr_lo][cnt_hi][cnt_lo][crc_lo][crc_hi]
-        slave = self.slave_id
-        req = bytes([
-            slave,
-            0x03,
-            (address >> 8) & 0xFF,
-            address & 0xFF,
-            (count >> 8) & 0xFF,
-            count & 0xFF
-        ])
-        crc = self.calculate_crc16(req)
-        req += bytes([crc & 0xFF, (crc >> 8) & 0xFF])
-        # 响应长度: 1+1+1+count*2+2
-        resp_len = 5 + count * 2
-        resp = self.send_and_recv(req, resp_len)
-        if not resp or len(resp) < resp_len:
-            return None
-        # 校验CRC
-        crc_calc = self.calculate_crc16(resp[:-2])
-        crc_recv = resp[-2] | (resp[-1] << 8)
-        if crc_calc != crc_recv:
-            if self.log_callback:
-                self.log_callback("CRC校验失败")
+        resp = self.execute(*build_read_request(0x03, address, count))
+        if resp is None:
             return None
-        # 解析数据
-        if resp[1] != 0x03:
-            return None
-        reg_bytes = resp[3:-2]
         
         # 使用新的解析方法
         if data_types:
-            return self.parse_modbus_data(reg_bytes, data_types)
+            return self.parse_modbus_data(resp[2:2 + count * 2], data_types)
         else:
             # 默认按uint16处理
-            return [reg_bytes[i] << 8 | reg_bytes[i+1] for i in range(0, len(reg_bytes), 2)]
+            return decode_registers(resp, count)
+
+    def read_holding_registers_many(self, spans):
+        """
+        批量读取多个保持寄存器区间，spans为[(address, count), ...]
+        返回与spans顺序一致的寄存器列表，失败的区间为None
+        """
+        responses = self.execute_many([build_read_request(0x03, address, count) for address, count in spans])
+        return [None if resp is None else decode_registers(resp, count)
+                for (address, count), resp in zip(spans, responses)]
+
+    def read_register_spans(self, spans, max_gap=None, max_count=MAX_READ_REGISTERS):
+        """
+        按读取计划读取多个寄存器区间，spans为[(address, count), ...]
+        相近区间合并、超长区间按max_count切分，返回与spans顺序一致的寄存器列表
+        """
+        plan = ReadPlan(spans, max_count, self.read_gap_tolerance if max_gap is None else max_gap)
+        plan.set_results(self.read_holding_registers_many(plan.blocks))
+        return [plan.extract(address, count) for address, count in plan.spans]
+
+    def read_holding_registers_block(self, address, count):
+        """读取任意长度的连续寄存器，超过单帧上限时自动分段，返回一个连续列表"""
+        return self.read_register_spans([(address, count)], max_gap=0)[0]
 
     def write_holding_register(self, address, value):
-        slave = self.slave_id
-        req = bytes([
-            slave,
-            0x06,
-            (address >> 8) & 0xFF,
-            address & 0xFF,
-            (value >> 8) & 0xFF,
-            value & 0xFF
-        ])
-        crc = self.calculate_crc16(req)
-        req += bytes([crc & 0xFF, (crc >> 8) & 0xFF])
-        resp_len = 8  # 固定长度
-        resp = self.send_and_recv(req, resp_len)
-        if not resp or len(resp) < resp_len:
-            return False
-        crc_calc = self.calculate_crc16(resp[:-2])
-        crc_recv = resp[-2] | (resp[-1] << 8)
-        if crc_calc != crc_recv:
-            if self.log_callback:
-                self.log_callback("CRC校验失败")
-            return False
-        return resp[1] == 0x06
+        return self.execute(*build_write_register_request(address, value)) is not None
 
     def write_holding_registers(self, address, values):
         # 批量写入功能码0x10
-        slave = self.slave_id
-        count = len(values)
-        byte_count = count * 2
-        req = bytes([
-            slave,
-            0x10,
-            (address >> 8) & 0xFF,
-            address & 0xFF,
-            (count >> 8) & 0xFF,
-            count & 0xFF,
-            byte_count
-        ])
-        for v in values:
-            req += bytes([(v >> 8) & 0xFF, v & 0xFF])
-        crc = self.calculate_crc16(req)
-        req += bytes([crc & 0xFF, (crc >> 8) & 0xFF])
-        resp_len = 8
-        resp = self.send_and_recv(req, resp_len)
-        if not resp or len(resp) < resp_len:
-            return False
-        crc_calc = self.calculate_crc16(resp[:-2])
-        crc_recv = resp[-2] | (resp[-1] << 8)
-        if crc_calc != crc_recv:
-            if self.log_callback:
-                self.log_callback("CRC校验失败")
-            return False
-        return resp[1] == 0x10
+        return self.execute(*build_write_registers_request(address, values)) is not None
 
     def read_input_registers(self, address, count):
-        # 组帧: [slave][0x04][addr_hi][addr_lo][cnt_hi][cnt_lo][crc_lo][crc_hi]
-        slave = self.slave_id
-        req = bytes([
-            slave,
-            0x04,
-            (address >> 8) & 0xFF,
-            address & 0xFF,
-            (count >> 8) & 0xFF,
-            count & 0xFF
-        ])
-        crc = self.calculate_crc16(req)
-        req += bytes([crc & 0xFF, (crc >> 8) & 0xFF])
-        resp_len = 5 + count * 2
-        resp = self.send_and_recv(req, resp_len)
-        if not resp or len(resp) < resp_len:
-            return None
-        crc_calc = self.calculate_crc16(resp[:-2])
-        crc_recv = resp[-2] | (resp[-1] << 8)
-        if crc_calc != crc_recv:
-            if self.log_callback:
-                self.log_callback("CRC校验失败")
-            return None
-        if resp[1] != 0x04:
+        resp = self.execute(*build_read_request(0x04, address, count))
+        if resp is None:
             return None
-        reg_bytes = resp[3:-2]
-        regs = self.parse_modbus_data(reg_bytes, ['uint16'] * count)
-        return regs 
\ No newline at end of file
+        return decode_registers(resp, count)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modbus CRC16计算模块
+
+提供三种实现：
+- crc16_bitwise: 逐位移位的原始算法（作为参照）
+- crc16_table:   256项预计算查表法，可直接作用于bytes/bytearray/memoryview
+- 加速后端:      若安装了crcmod（C扩展），自动使用
+"""
+
+import timeit
+
+CRC16_MODBUS_POLY = 0xA001
+CRC16_MODBUS_INIT = 0xFFFF
+
+
+def _build_crc16_table(poly=CRC16_MODBUS_POLY):
+    """生成256项CRC16查找表"""
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC16_TABLE = _build_crc16_table()
+
+
+def crc16_bitwise(data):
+    """逐位计算CRC16（原ModbusClient.calculate_crc16的实现）"""
+    crc = CRC16_MODBUS_INIT
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ CRC16_MODBUS_POLY
+            else:
+                crc >>= 1
+    return crc & 0xFFFF
+
+
+def crc16_table(data, start=0, end=None):
+    """
+    查表法计算CRC16
+    data: bytes/bytearray/memoryview，不做拷贝
+    start/end: 只计算data[start:end]部分
+    """
+    if isinstance(data, memoryview) and data.format != 'B':
+        data = data.cast('B')
+    if end is None:
+        end = len(data)
+    table = CRC16_TABLE
+    crc = CRC16_MODBUS_INIT
+    for i in range(start, end):
+        crc = (crc >> 8) ^ table[(crc ^ data[i]) & 0xFF]
+    return crc
+
+
+def _load_accelerated_backend():
+    """尝试加载C实现的CRC16，不可用时返回None"""
+    try:
+        import crcmod.predefined
+    except ImportError:
+        return None
+    try:
+        func = crcmod.predefined.mkPredefinedCrcFun('modbus')
+    except Exception:
+        return None
+
+    def crc16_accelerated(data, start=0, end=None):
+        if start or end is not None:
+            data = memoryview(data)[start:end]
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        return func(data)
+
+    return crc16_accelerated
+
+
+_BACKENDS = {
+    'bitwise': lambda data, start=0, end=None: crc16_bitwise(memoryview(data)[start:end]),
+    'table': crc16_table,
+}
+_accelerated = _load_accelerated_backend()
+if _accelerated is not None:
+    _BACKENDS['accelerated'] = _accelerated
+
+
+def get_available_backends():
+    """获取可用的CRC16后端名称列表"""
+    return list(_BACKENDS.keys())
+
+
+def get_crc16_function(backend=None):
+    """
+    获取CRC16计算函数
+    backend: 'bitwise' / 'table' / 'accelerated'，为None时选择最快的可用后端
+    """
+    if backend is None:
+        backend = 'accelerated' if 'accelerated' in _BACKENDS else 'table'
+    if backend not in _BACKENDS:
+        raise ValueError(f"不支持的CRC16后端: {backend}")
+    return _BACKENDS[backend]
+
+
+def check_crc16(frame, crc_func=None):
+    """
+    校验带CRC的完整帧
+    对包含CRC的整帧计算CRC16，结果为0即校验通过，无需切片拷贝
+    """
+    if frame is None or len(frame) < 3:
+        return False
+    return (crc_func or get_crc16_function())(frame) == 0
+
+
+def benchmark_crc16(frame_len=255, number=2000):
+    """
+    CRC16微基准测试
+    frame_len: 帧长度（默认255字节，即125寄存器读响应的长度）
+    返回 {后端名: 每帧耗时(微秒)}
+    """
+    frame = bytes((i * 7 + 3) & 0xFF for i in range(frame_len))
+    expected = crc16_bitwise(frame)
+    results = {}
+    for name, func in _BACKENDS.items():
+        if func(frame) != expected:
+            raise AssertionError(f"CRC16后端 {name} 计算结果不一致")
+        elapsed = timeit.timeit(lambda: func(frame), number=number)
+        results[name] = elapsed / number * 1e6
+    # 额外测试memoryview输入（不拷贝）
+    view = memoryview(bytearray(frame))
+    elapsed = timeit.timeit(lambda: crc16_table(view), number=number)
+    results['table(memoryview)'] = elapsed / number * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    for length in (8, 255):
+        print(f"帧长度 {length} 字节:")
+        results = benchmark_crc16(length)
+        baseline = results['bitwise']
+        for name, us in results.items():
+            print(f"  {name:<20s} {us:8.2f} us/帧  ({baseline / us:5.1f}x)")
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modbus传输层模块
+
+传输层只负责ADU的组帧、收发和校验，对上层(ModbusClient)统一以PDU
+（功能码+数据）交互：
+- SerialRtuTransport:  串口RTU
+- TcpTransport:        Modbus TCP（MBAP报文头，事务ID匹配）
+- RtuOverTcpTransport: 通过TCP透传的RTU帧（串口服务器/网关）
+"""
+
+import socket
+import struct
+import time
+
+import serial
+
+from modbus_crc import get_crc16_function, check_crc16
+
+# 收发时序模式
+TIMING_FIXED = 'fixed'  # 旧模式：发送后固定等待50ms再一次性读取
+TIMING_FRAME = 'frame'  # 帧时序模式：按3.5字符静默间隔和帧头长度增量读取
+
+MBAP_HEADER_LEN = 7
+
+
+def rtu_char_time(baudrate):
+    """RTU单个字符传输时间（秒），按11位/字符计算"""
+    return 11.0 / baudrate
+
+
+def rtu_silent_interval(baudrate):
+    """
+    RTU帧间静默间隔t3.5（秒）
+    按Modbus规范，波特率大于19200时固定为1.75ms
+    """
+    if baudrate > 19200:
+        return 0.00175
+    return 3.5 * rtu_char_time(baudrate)
+
+
+def rtu_expected_length(frame):
+    """
+    根据已收到的帧头推算完整RTU响应帧长度
+    返回None表示帧头不足以判断
+    """
+    if len(frame) < 2:
+        return None
+    function = frame[1]
+    if function & 0x80:
+        # 异常响应: [slave][func|0x80][code][crc_lo][crc_hi]
+        return 5
+    if function in (0x01, 0x02, 0x03, 0x04):
+        if len(frame) < 3:
+            return None
+        # [slave][func][byte_count][data...][crc_lo][crc_hi]
+        return 5 + frame[2]
+    if function in (0x05, 0x06, 0x0F, 0x10):
+        return 8
+    return None
+
+
+class RtuFrameReceiver:
+    """
+    增量RTU响应帧接收状态
+    - 根据帧头（功能码/字节数）得知完整帧长度，收齐即完成
+    - 异常响应（功能码|0x80）收满5字节即完成
+    - 帧头无法判断长度时，已收到数据后出现超过t3.5的静默间隔视为帧结束
+      （能推算长度时不依赖静默判断，避免USB转串口分块延迟造成截帧）
+    """
+
+    def __init__(self, max_len, baudrate, now):
+        self.max_len = max_len
+        self.silent = rtu_silent_interval(baudrate)
+        self.buf = bytearray()
+        self.expected = None
+        self.last_rx = now
+
+    def wanted(self, available):
+        """本次最多应读取的字节数，避免读入下一帧的数据"""
+        limit = self.expected if self.expected is not None else self.max_len
+        return min(available, max(limit - len(self.buf), 1))
+
+    def feed(self, data, now):
+        self.buf += data
+        self.last_rx = now
+        if self.expected is None:
+            self.expected = rtu_expected_length(self.buf)
+
+    def is_complete(self, now):
+        target = self.expected if self.expected is not None else self.max_len
+        if len(self.buf) >= target:
+            return True
+        return bool(self.buf) and self.expected is None and now - self.last_rx > self.silent
+
+
+def format_hex(data):
+    return " ".join(f"{b:02X}" for b in data)
+
+
+class ModbusTransport:
+    """传输层基类"""
+
+    supports_pipelining = False
+
+    def __init__(self, timeout=1):
+        self.timeout = timeout
+        self.log_callback = None
+
+    def open(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def is_open(self):
+        raise NotImplementedError
+
+    def transact(self, slave_id, pdu, resp_pdu_len):
+        """
+        发送一个请求PDU并返回响应PDU
+        resp_pdu_len: 正常响应的PDU长度（功能码+数据）
+        返回None表示超时、校验失败或链路错误；异常响应原样返回
+        """
+        raise NotImplementedError
+
+    def transact_many(self, requests, window=1, timeout=None):
+        """
+        批量执行请求，requests为[(slave_id, pdu, resp_pdu_len), ...]
+        返回与requests顺序一致的响应PDU列表；默认逐个顺序执行
+        """
+        return [self.transact(slave_id, pdu, resp_pdu_len) for slave_id, pdu, resp_pdu_len in requests]
+
+    def log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def log_exception_response(self, pdu):
+        if pdu and len(pdu) >= 2 and pdu[0] & 0x80:
+            self.log(f"异常响应: 功能码0x{pdu[0] & 0x7F:02X}, 异常码0x{pdu[1]:02X}")
+
+
+class RtuFramingMixin:
+    """RTU帧格式: [slave][pdu...][crc_lo][crc_hi]"""
+
+    crc16 = staticmethod(get_crc16_function())
+
+    def set_crc_backend(self, backend=None):
+        self.crc16 = get_crc16_function(backend)
+
+    def build_rtu_frame(self, slave_id, pdu):
+        frame = bytes([slave_id]) + pdu
+        crc = self.crc16(frame)
+        return frame + bytes([crc & 0xFF, (crc >> 8) & 0xFF])
+
+    def parse_rtu_frame(self, slave_id, frame):
+        """校验RTU响应帧，返回其中的PDU；不合法返回None"""
+        if not frame or len(frame) < 5:
+            return None
+        if not check_crc16(frame, self.crc16):
+            self.log("CRC校验失败")
+            return None
+        if frame[0] != slave_id:
+            self.log(f"从站地址不匹配: 期望{slave_id}, 收到{frame[0]}")
+            return None
+        return bytes(frame[1:-2])
+
+
+class SerialRtuTransport(RtuFramingMixin, ModbusTransport):
+    """串口RTU传输"""
+
+    def __init__(self, port, baudrate=9600, timeout=1, timing_mode=TIMING_FRAME):
+        super().__init__(timeout)
+        self.port = port
+        self.baudrate = baudrate
+        self.timing_mode = timing_mode
+        self.ser = None
+
+    def open(self):
+        self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, bytesize=8, parity='N',
+                                 stopbits=1, timeout=self.timeout)
+        return self.ser.is_open
+
+    def close(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def is_open(self):
+        return bool(self.ser and self.ser.is_open)
+
+    def transact(self, slave_id, pdu, resp_pdu_len):
+        request = self.build_rtu_frame(slave_id, pdu)
+        response = self.send_and_recv(request, resp_pdu_len + 3)
+        return self.parse_rtu_frame(slave_id, response)
+
+    def send_and_recv(self, request: bytes, resp_len: int):
+        if not self.is_open():
+            return None
+        self.ser.reset_input_buffer()
+        self.ser.write(request)
+        self.log("发送：" + format_hex(request))
+        if self.timing_mode == TIMING_FRAME:
+            response = self.read_frame(resp_len)
+        else:
+            time.sleep(0.05)
+            response = self.ser.read(resp_len)
+        self.log("接收：" + format_hex(response))
+        self.log_exception_response(response[1:])
+        return response
+
+    def read_frame(self, max_len: int):
+        """
+        增量读取一个RTU响应帧（完成条件见RtuFrameReceiver）
+        一个字节都没有收到时，等待到self.timeout超时
+        """
+        poll = min(rtu_char_time(self.baudrate) * 2, 0.001)
+        start = time.perf_counter()
+        receiver = RtuFrameReceiver(max_len, self.baudrate, start)
+        while True:
+            waiting = self.ser.in_waiting
+            now = time.perf_counter()
+            if waiting:
+                receiver.feed(self.ser.read(receiver.wanted(waiting)), now)
+            if receiver.is_complete(now) or now - start > self.timeout:
+                break
+            if not waiting:
+                time.sleep(poll)
+        return bytes(receiver.buf)
+
+
+class SocketTransportBase(ModbusTransport):
+    """基于TCP套接字的传输公共部分"""
+
+    def __init__(self, host, port=502, timeout=1):
+        super().__init__(timeout)
+        self.host = host
+        self.port = port
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return True
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def is_open(self):
+        return self.sock is not None
+
+    def drain(self):
+        """丢弃接收缓冲区中残留的过期数据"""
+        self.sock.setblocking(False)
+        try:
+            while self.sock.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.sock.setblocking(True)
+
+    def recv_exact(self, size, deadline):
+        """在截止时间前收满size字节，超时返回None"""
+        buf = bytearray()
+        while len(buf) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv(size - len(buf))
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise ConnectionError("连接已被对端关闭")
+            buf += chunk
+        return bytes(buf)
+
+    def transact(self, slave_id, pdu, resp_pdu_len):
+        if not self.is_open():
+            return None
+        try:
+            return self.socket_transact(slave_id, pdu, resp_pdu_len)
+        except OSError as e:
+            self.log(f"网络通信错误: {e}")
+            self.close()
+            return None
+
+    def socket_transact(self, slave_id, pdu, resp_pdu_len):
+        raise NotImplementedError
+
+
+class TcpTransport(SocketTransportBase):
+    """Modbus TCP传输: [tid][pid=0][len][unit][pdu...]"""
+
+    supports_pipelining = True
+
+    def __init__(self, host, port=502, timeout=1):
+        super().__init__(host, port, timeout)
+        self.transaction_id = 0
+        self.rx_buffer = bytearray()
+
+    def next_transaction_id(self):
+        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+        return self.transaction_id
+
+    def build_mbap_frame(self, transaction_id, unit_id, pdu):
+        return struct.pack('>HHHB', transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+
+    def open(self):
+        self.rx_buffer = bytearray()
+        return super().open()
+
+    def parse_mbap_buffer(self):
+        """从接收缓冲区取出一个完整MBAP帧，不完整时返回None"""
+        if len(self.rx_buffer) < MBAP_HEADER_LEN:
+            return None
+        transaction_id, protocol_id, length, unit_id = struct.unpack_from('>HHHB', self.rx_buffer)
+        if protocol_id != 0 or length < 2:
+            raise ConnectionError(f"非法MBAP报文头: {format_hex(self.rx_buffer[:MBAP_HEADER_LEN])}")
+        frame_len = 6 + length
+        if len(self.rx_buffer) < frame_len:
+            return None
+        frame = bytes(self.rx_buffer[:frame_len])
+        del self.rx_buffer[:frame_len]
+        self.log("接收：" + format_hex(frame))
+        return transaction_id, unit_id, frame[MBAP_HEADER_LEN:]
+
+    def recv_mbap_frame(self, deadline):
+        """
+        接收一个完整的MBAP帧，返回(事务ID, 单元ID, PDU)；超时返回None
+        未收完的部分保留在缓冲区中，不会因超时造成帧错位
+        """
+        while True:
+            frame = self.parse_mbap_buffer()
+            if frame is not None:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv(4096)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise ConnectionError("连接已被对端关闭")
+            self.rx_buffer += chunk
+
+    def socket_transact(self, slave_id, pdu, resp_pdu_len):
+        return self.pipelined_transact([(slave_id, pdu, resp_pdu_len)], 1, self.timeout)[0]
+
+    def transact_many(self, requests, window=4, timeout=None):
+        """
+        流水线方式批量执行请求
+        同一连接上最多保持window个未完成请求，按MBAP事务ID匹配响应；
+        每个请求独立计时，超时的请求结果为None
+        """
+        if not self.is_open():
+            return [None] * len(requests)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return self.pipelined_transact(requests, max(1, window), timeout)
+        except OSError as e:
+            self.log(f"网络通信错误: {e}")
+            self.close()
+            return [None] * len(requests)
+
+    def pipelined_transact(self, requests, window, timeout):
+        results = [None] * len(requests)
+        pending = {}  # 事务ID -> (请求序号, 截止时间)
+        next_index = 0
+        while next_index < len(requests) or pending:
+            # 填满发送窗口
+            while next_index < len(requests) and len(pending) < window:
+                slave_id, pdu, _ = requests[next_index]
+                transaction_id = self.next_transaction_id()
+                request = self.build_mbap_frame(transaction_id, slave_id, pdu)
+                self.sock.sendall(request)
+                self.log("发送：" + format_hex(request))
+                pending[transaction_id] = (next_index, time.monotonic() + timeout)
+                next_index += 1
+
+            frame = self.recv_mbap_frame(min(deadline for _, deadline in pending.values()))
+            if frame is None:
+                now = time.monotonic()
+                for transaction_id, (_, deadline) in list(pending.items()):
+                    if deadline <= now:
+                        self.log(f"事务{transaction_id}响应超时")
+                        del pending[transaction_id]
+                continue
+            rx_tid, _, rx_pdu = frame
+            entry = pending.pop(rx_tid, None)
+            if entry is None:
+                # 之前超时请求的迟到响应，丢弃
+                self.log(f"丢弃过期事务{rx_tid}的响应")
+                continue
+            self.log_exception_response(rx_pdu)
+            results[entry[0]] = rx_pdu
+        return results
+
+
+class RtuOverTcpTransport(RtuFramingMixin, SocketTransportBase):
+    """RTU帧通过TCP透传（串口服务器透明传输模式）"""
+
+    def socket_transact(self, slave_id, pdu, resp_pdu_len):
+        request = self.build_rtu_frame(slave_id, pdu)
+        self.drain()
+        self.sock.sendall(request)
+        self.log("发送：" + format_hex(request))
+        deadline = time.monotonic() + self.timeout
+        buf = bytearray()
+        expected = None
+        while expected is None or len(buf) < expected:
+            need = (expected - len(buf)) if expected is not None else 3 - len(buf)
+            chunk = self.recv_exact(max(need, 1), deadline)
+            if chunk is None:
+                break
+            buf += chunk
+            if expected is None:
+                expected = rtu_expected_length(buf)
+                if expected is None and len(buf) >= 3:
+                    # 不支持的功能码，无法判断帧长
+                    break
+        self.log("接收：" + format_hex(buf))
+        self.log_exception_response(buf[1:])
+        return self.parse_rtu_frame(slave_id, buf)
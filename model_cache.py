@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型编译缓存模块
+
+把model_xxx.json编译后的ModelCodec以pickle形式缓存到磁盘，每个模型文件一个缓存项，
+以(文件路径, mtime, 大小, SHA1)为键：
+- mtime和大小未变：直接反序列化缓存，不读取也不解析JSON
+- mtime变化但内容哈希相同：沿用缓存并刷新mtime
+- 内容变化或缓存损坏：重新解析编译并覆盖缓存
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+from sunspec_codec import compile_model
+
+# 编译结果结构变化时递增，使旧缓存失效
+CACHE_FORMAT_VERSION = 3
+
+
+class ModelCache:
+    """模型编译缓存"""
+
+    def __init__(self, cache_dir='.model_cache'):
+        self.cache_dir = cache_dir
+        self.memory = {}  # 路径 -> (mtime_ns, size, codec)，进程内缓存
+
+    def cache_file(self, path):
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def read_entry(self, path):
+        try:
+            with open(self.cache_file(path), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if not isinstance(entry, dict) or entry.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        if entry.get('path') != os.path.abspath(path):
+            return None
+        return entry
+
+    def write_entry(self, path, stat, digest, codec):
+        entry = {
+            'version': CACHE_FORMAT_VERSION,
+            'path': os.path.abspath(path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha1': digest,
+            'codec': codec,
+        }
+        target = self.cache_file(path)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, target)
+        except OSError as e:
+            print(f"写入模型缓存失败: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def is_stale(self, path):
+        """进程内缓存的path是否已过期（文件被修改或删除，或尚未加载）"""
+        cached = self.memory.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        return cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size)
+
+    def load(self, path):
+        """
+        加载模型文件对应的ModelCodec（优先使用缓存）
+        文件不存在时抛出FileNotFoundError，JSON错误时抛出ValueError
+        """
+        stat = os.stat(path)
+        cached = self.memory.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        entry = self.read_entry(path)
+        if entry and (entry['mtime_ns'], entry['size']) == (stat.st_mtime_ns, stat.st_size):
+            codec = entry['codec']
+        else:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            digest = hashlib.sha1(raw).hexdigest()
+            if entry and entry['sha1'] == digest:
+                codec = entry['codec']
+            else:
+                codec = compile_model(json.loads(raw.decode('utf-8')))
+            self.write_entry(path, stat, digest, codec)
+
+        self.memory[path] = (stat.st_mtime_ns, stat.st_size, codec)
+        return codec
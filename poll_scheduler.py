@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询调度模块
+
+把每个模型的字段按变化快慢分组，各组独立设置轮询周期：
+- static: 模型JSON中"static": "S"的点和缩放因子(sunssf)，只需成功读取一次
+- fast:   电流/电压/功率和SoC等快速变化的点，默认250ms
+- normal: 其余点，默认5s
+每组只读取自己的寄存器区间，结果写入该模型的寄存器镜像后再解析，
+这样快速组也能用到静态组读到的缩放因子。解析是增量的：与上一次的镜像比较，
+只重新解析寄存器有变化的点，轮询结果只包含值发生变化的字段。
+总线繁忙（占用率过高或轮询请求过期被丢弃）时所有非静态组的周期按同一倍数放大，
+总线空闲后逐步恢复。
+"""
+
+import time
+
+GROUP_STATIC = 'static'
+GROUP_FAST = 'fast'
+GROUP_NORMAL = 'normal'
+
+DEFAULT_INTERVALS = {GROUP_STATIC: 5.0, GROUP_FAST: 0.25, GROUP_NORMAL: 5.0}
+FAST_UNITS = ('A', 'V', 'W')
+FAST_POINTS = ('SoC',)
+
+BUSY_HIGH = 0.8  # 总线占用率高于此值时退避
+BUSY_LOW = 0.5  # 低于此值时逐步恢复
+BACKOFF_STEP = 1.5
+RECOVER_STEP = 1.25
+MAX_BACKOFF = 16.0
+LOAD_WINDOW = 2.0  # 统计总线占用率的时间窗口（秒）
+
+
+def classify_point(point):
+    """按模型JSON中的点定义返回所属分组"""
+    if point.get('static') == 'S' or point['type'].lower() == 'sunssf':
+        return GROUP_STATIC
+    if point.get('units') in FAST_UNITS or point['name'] in FAST_POINTS:
+        return GROUP_FAST
+    return GROUP_NORMAL
+
+
+class PollGroup:
+    """一个模型中按相同周期轮询的一组字段"""
+
+    def __init__(self, table_id, kind, field_names, spans, interval):
+        self.table_id = table_id
+        self.kind = kind
+        self.field_names = field_names
+        self.spans = spans  # 相对模型起始地址的寄存器区间 [(offset, size), ...]
+        self.interval = interval
+        self.next_due = 0.0
+        self.in_flight = False
+        self.done = False  # 静态组读取成功后不再轮询
+        self.seeded = False  # 首次读取成功后返回全部字段，之后只返回变化的字段
+        self.polls = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @property
+    def name(self):
+        return f"{self.table_id}:{self.kind}"
+
+
+class PollScheduler:
+    """自适应轮询调度器（只负责决定何时读取哪些字段，读取本身由调用方提交到I/O线程）"""
+
+    def __init__(self, sunspec_protocol, intervals=None):
+        self.protocol = sunspec_protocol
+        self.intervals = dict(DEFAULT_INTERVALS)
+        if intervals:
+            self.intervals.update(intervals)
+        self.groups = []
+        self.images = {}  # table_id -> 寄存器镜像（只在I/O线程中读写）
+        self.known = {}  # table_id -> 已读取过的字段名，未读过的字段变化不上报
+        self.backoff = 1.0
+        self.last_adjust = 0.0  # 每个统计窗口最多调整一次退避倍数
+        self.busy = []  # [(完成时间, 耗时), ...] 最近的轮询耗时
+
+    def configure(self, table_ids):
+        """为各表格建立轮询分组"""
+        self.groups = []
+        self.images = {}
+        self.known = {}
+        for table_id in table_ids:
+            codec = self.protocol.get_codec(table_id)
+            if codec is None:
+                continue
+            # 按解码器使用的偏移取区间，保证镜像与解析布局一致
+            index = codec.index
+            members = {}
+            for point in codec.model_data['group']['points']:
+                if point['name'] in index:
+                    members.setdefault(classify_point(point), []).append(point['name'])
+            spans = {kind: [index[name][:2] for name in names] for kind, names in members.items()}
+            # 重复组的行数取决于扫描到的模型长度L，整块随普通组一起读取
+            length = self.protocol.model_lengths.get(table_id)
+            group_spans = codec.group_spans(length + 2) if length is not None else []
+            if group_spans:
+                members.setdefault(GROUP_NORMAL, []).extend(group.name for group in codec.groups)
+                spans.setdefault(GROUP_NORMAL, []).extend(group_spans)
+            for kind, names in members.items():
+                self.groups.append(PollGroup(table_id, kind, names, spans[kind], self.intervals[kind]))
+            self.known[table_id] = set()
+            self.images[table_id] = [0] * max(
+                [codec.total_registers, 0 if length is None else length + 2] +
+                [offset + size for offset, size, _ in index.values()])
+        # 静态组排在前面，首轮先读到缩放因子
+        self.groups.sort(key=lambda group: group.kind != GROUP_STATIC)
+
+    def set_interval(self, table_id, kind, interval):
+        """设置某个模型某个分组的轮询周期（秒）"""
+        for group in self.groups:
+            if group.table_id == table_id and group.kind == kind:
+                group.interval = interval
+
+    def effective_interval(self, group):
+        if group.kind == GROUP_STATIC:
+            return group.interval
+        return group.interval * self.backoff
+
+    def start(self, now=None):
+        now = time.monotonic() if now is None else now
+        # 上次会话（如断开连接时丢弃的轮询）留下的退避和占用统计不再适用
+        self.backoff = 1.0
+        self.last_adjust = 0.0
+        self.busy = []
+        for group in self.groups:
+            group.next_due = now
+            group.in_flight = False
+            group.done = False
+            group.seeded = False
+        for table_id, known in self.known.items():
+            known.clear()
+            self.protocol.reset_delta(table_id)
+
+    def due_groups(self, now=None):
+        """返回到期且未在执行中的分组，并把它们标记为执行中"""
+        now = time.monotonic() if now is None else now
+        due = []
+        for group in self.groups:
+            if group.done or group.in_flight or group.next_due > now:
+                continue
+            group.in_flight = True
+            group.next_due = now + self.effective_interval(group)
+            due.append(group)
+        return due
+
+    def poll(self, group, modbus_client):
+        """
+        读取一个分组（在I/O线程中调用）
+        返回 (发生变化的字段{name: 字段信息}，失败时为None, 耗时)
+        该组首次读取成功时返回组内全部字段
+        """
+        start = time.monotonic()
+        base_addr = self.protocol.model_base_addrs.get(group.table_id)
+        image = self.images.get(group.table_id)
+        if base_addr is None or image is None:
+            return None, 0.0
+        # 组内相近字段由读取规划合并为尽量少的请求
+        values = modbus_client.read_register_spans([(base_addr + offset, size) for offset, size in group.spans])
+        if any(regs is None for regs in values):
+            return None, time.monotonic() - start
+        for (offset, size), regs in zip(group.spans, values):
+            image[offset:offset + size] = regs
+        changed = self.protocol.parse_table_delta(group.table_id, image)
+        if changed is None:
+            return None, time.monotonic() - start
+        known = self.known[group.table_id]
+        if not group.seeded:
+            known.update(group.field_names)
+            missing = [name for name in group.field_names if name not in changed]
+            if missing:
+                parsed = self.protocol.parse_table_data(group.table_id, image)
+                changed.update((name, parsed[name]) for name in missing if name in parsed)
+            group.seeded = True
+        # 缩放因子变化会影响其它组的字段，一并上报；还没读过的字段不上报
+        return {name: field for name, field in changed.items() if name in known}, time.monotonic() - start
+
+    def record(self, group, ok, elapsed, now=None):
+        """记录一次轮询结果，并据总线占用率调整退避倍数"""
+        now = time.monotonic() if now is None else now
+        group.in_flight = False
+        group.polls += 1
+        if ok:
+            if group.kind == GROUP_STATIC:
+                group.done = True
+        else:
+            group.failures += 1
+        self.busy.append((now, elapsed))
+        self.adapt(now)
+
+    def record_dropped(self, group, now=None):
+        """轮询请求排队过期被丢弃，说明总线已饱和"""
+        now = time.monotonic() if now is None else now
+        group.in_flight = False
+        group.dropped += 1
+        self.adjust(BACKOFF_STEP, now)
+
+    def bus_load(self, now=None):
+        """最近LOAD_WINDOW秒内轮询占用总线的时间比例"""
+        now = time.monotonic() if now is None else now
+        self.busy = [(t, elapsed) for t, elapsed in self.busy if now - t <= LOAD_WINDOW]
+        return sum(elapsed for _, elapsed in self.busy) / LOAD_WINDOW
+
+    def adapt(self, now):
+        load = self.bus_load(now)
+        if load > BUSY_HIGH:
+            self.adjust(BACKOFF_STEP, now)
+        elif load < BUSY_LOW and self.backoff > 1.0:
+            self.adjust(1.0 / RECOVER_STEP, now)
+
+    def adjust(self, factor, now):
+        if now - self.last_adjust < LOAD_WINDOW:
+            return
+        self.last_adjust = now
+        self.backoff = min(MAX_BACKOFF, max(1.0, self.backoff * factor))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+寄存器读取规划模块
+
+把一组待读取的寄存器区间规划为尽量少的、符合Modbus单次读取上限的请求：
+- 相邻或间隔不超过max_gap的区间合并为一次读取
+- 合并时不拆分单个区间（避免32位等多寄存器字段被拆到两个请求里）
+- 单个区间超过上限时按上限切分
+"""
+
+MAX_READ_REGISTERS = 125  # 功能码0x03/0x04单次最多读取的寄存器数
+
+
+def plan_reads(spans, max_count=MAX_READ_REGISTERS, max_gap=0):
+    """
+    spans: [(address, count), ...]
+    返回按地址排序的读取块 [(address, count), ...]
+    """
+    blocks = []
+    start = end = None  # 当前块 [start, end)
+    for address, count in sorted(set(spans)):
+        if count <= 0:
+            continue
+        span_end = address + count
+        if start is not None and span_end <= end:
+            # 已被当前块覆盖
+            continue
+        if start is not None and address - end <= max_gap and span_end - start <= max_count:
+            end = span_end
+            continue
+        if start is not None:
+            blocks.append((start, end - start))
+        if count > max_count:
+            # 超长区间切分，最后一段作为当前块继续参与合并
+            while span_end - address > max_count:
+                blocks.append((address, max_count))
+                address += max_count
+        start, end = address, span_end
+    if start is not None:
+        blocks.append((start, end - start))
+    return blocks
+
+
+class ReadPlan:
+    """读取计划：记录规划出的读取块，并从读取结果中取回任意区间"""
+
+    def __init__(self, spans, max_count=MAX_READ_REGISTERS, max_gap=0):
+        self.spans = list(spans)
+        self.blocks = plan_reads(self.spans, max_count, max_gap)
+        self.results = {}
+
+    def set_results(self, results):
+        """results: 与self.blocks顺序一致的寄存器列表，失败的块为None"""
+        self.results = {block: regs for block, regs in zip(self.blocks, results)}
+
+    def extract(self, address, count):
+        """取回[address, address+count)的寄存器值；任一部分未读到时返回None"""
+        values = []
+        cursor = address
+        end = address + count
+        for block_addr, block_count in self.blocks:
+            block_end = block_addr + block_count
+            if block_end <= cursor or block_addr > cursor:
+                continue
+            regs = self.results.get((block_addr, block_count))
+            if regs is None or len(regs) < block_count:
+                return None
+            take_end = min(end, block_end)
+            values.extend(regs[cursor - block_addr:take_end - block_addr])
+            cursor = take_end
+            if cursor >= end:
+                return values
+        return values if cursor >= end else None
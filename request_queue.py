@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+总线请求队列模块
+
+所有对ModbusClient的访问都提交到队列，由唯一的工作线程按优先级串行执行：
+- PRIORITY_WRITE: 控制/设定值写入，最先执行
+- PRIORITY_READ:  用户触发的读取、扫描
+- PRIORITY_POLL:  后台轮询，带截止时间，过期未执行的请求直接丢弃
+同优先级按提交顺序执行。正在执行的请求不会被打断，写入的最大等待时间
+即一个请求的执行时间，因此后台轮询应按表格等小粒度提交。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_POLL = 2
+
+PRIORITY_NAMES = {PRIORITY_WRITE: 'write', PRIORITY_READ: 'read', PRIORITY_POLL: 'poll'}
+
+
+class QueuedRequest:
+    """已提交的请求，可等待结果"""
+
+    def __init__(self, func, priority, deadline=None, callback=None):
+        self.func = func  # func(modbus_client) -> 结果
+        self.priority = priority
+        self.deadline = deadline  # time.monotonic()时间，None表示不过期
+        self.callback = callback  # callback(request)，在工作线程中调用
+        self.submitted = time.monotonic()
+        self.result = None
+        self.dropped = False
+        self.finished = threading.Event()
+
+    def wait(self, timeout=None):
+        """等待执行完成并返回结果；被丢弃或等待超时返回None"""
+        self.finished.wait(timeout)
+        return self.result
+
+
+class RequestQueue:
+    """按优先级串行访问总线的请求队列"""
+
+    def __init__(self, modbus_client, log=None):
+        self.client = modbus_client
+        self.log = log or (lambda msg: None)
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        # 各优先级统计: 执行数、丢弃数、最大排队等待（秒）
+        self.stats = {p: {'executed': 0, 'dropped': 0, 'max_wait': 0.0} for p in PRIORITY_NAMES}
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """停止工作线程并丢弃排队的请求；timeout为等待当前请求结束的最长时间，None为一直等待"""
+        with self.condition:
+            self.running = False
+            pending = [item[2] for item in self.heap]
+            self.heap.clear()
+            self.condition.notify_all()
+        for request in pending:
+            self.finish(request, None, dropped=True)
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+
+    def in_worker(self):
+        return self.thread is not None and self.thread is threading.current_thread()
+
+    def submit(self, func, priority=PRIORITY_READ, deadline=None, callback=None):
+        """
+        提交请求，返回QueuedRequest
+        deadline: 截止时间（time.monotonic()），过期仍未执行时丢弃
+        """
+        request = QueuedRequest(func, priority, deadline, callback)
+        with self.condition:
+            if not self.running:
+                self.finish(request, None, dropped=True)
+                return request
+            heapq.heappush(self.heap, (priority, next(self.counter), request))
+            self.condition.notify()
+        return request
+
+    def call(self, func, priority=PRIORITY_READ, timeout=None):
+        """提交并等待结果；在工作线程内调用时直接执行，避免自锁"""
+        if self.in_worker() or not self.running:
+            return func(self.client)
+        return self.submit(func, priority).wait(timeout)
+
+    def drop_polls(self):
+        """丢弃所有排队中的后台轮询请求（如断开连接时）"""
+        with self.condition:
+            polls = [item for item in self.heap if item[0] == PRIORITY_POLL]
+            self.heap = [item for item in self.heap if item[0] != PRIORITY_POLL]
+            heapq.heapify(self.heap)
+        for _, _, request in polls:
+            self.finish(request, None, dropped=True)
+
+    def pending_count(self, priority=None):
+        with self.condition:
+            return sum(1 for item in self.heap if priority is None or item[0] == priority)
+
+    def next_request(self):
+        with self.condition:
+            while self.running and not self.heap:
+                self.condition.wait()
+            if not self.running:
+                return None
+            return heapq.heappop(self.heap)[2]
+
+    def run(self):
+        while True:
+            request = self.next_request()
+            if request is None:
+                return
+            now = time.monotonic()
+            stats = self.stats[request.priority]
+            if request.deadline is not None and now > request.deadline:
+                stats['dropped'] += 1
+                self.finish(request, None, dropped=True)
+                continue
+            stats['executed'] += 1
+            stats['max_wait'] = max(stats['max_wait'], now - request.submitted)
+            try:
+                result = request.func(self.client)
+            except Exception as e:
+                self.log(f"总线请求执行失败: {e}")
+                result = None
+            self.finish(request, result)
+
+    def finish(self, request, result, dropped=False):
+        request.result = result
+        request.dropped = dropped
+        request.finished.set()
+        if request.callback:
+            try:
+                request.callback(request)
+            except Exception as e:
+                self.log(f"请求回调失败: {e}")
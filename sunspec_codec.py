@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SunSpec模型编解码模块
+
+把model_xxx.json预编译为ModelCodec：
+- 每个点的偏移、长度在编译时确定
+- 类型解析函数预先选好，解析时不再做类型字符串判断
+- 单位/标签/描述/访问权限等静态信息与数值分开保存
+- 重复组(group.groups，如805的电芯块)编译为行布局，按行数一次性解码为结构化数组
+解析一次表格数据只剩下寄存器运算。
+"""
+
+import struct
+import timeit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _decode_uint16(data, offset, end):
+    return data[offset]
+
+
+def _decode_int16(data, offset, end):
+    value = data[offset]
+    return value - 65536 if value > 32767 else value
+
+
+def _decode_uint32(data, offset, end):
+    return (data[offset] << 16) | data[offset + 1]
+
+
+def _decode_int32(data, offset, end):
+    value = (data[offset] << 16) | data[offset + 1]
+    return value - 0x100000000 if value > 0x7FFFFFFF else value
+
+
+def _decode_string(data, offset, end):
+    # 每个寄存器2字节，低字节在前拼接为字符串（latin-1逐字节对应chr(b)）
+    raw = struct.pack(f'<{end - offset}H', *data[offset:end])
+    return raw.decode('latin-1').rstrip('\x00').strip()
+
+
+_format_hex_reg = '{:04X}'.format
+
+
+def _decode_hex(data, offset, end):
+    # 直接显示16进制数据，用空格分隔多个寄存器
+    return ' '.join(map(_format_hex_reg, data[offset:end]))
+
+
+TYPE_DECODERS = {
+    'uint16': _decode_uint16,
+    'sunssf': _decode_int16,
+    'int16': _decode_int16,
+    'uint32': _decode_uint32,
+    'int32': _decode_int32,
+    'enum16': _decode_uint16,
+    'bitfield32': _decode_uint32,
+    'string': _decode_string,
+    'hex': _decode_hex,
+}
+
+SUNSSF_NOT_IMPLEMENTED = -32768  # sunssf寄存器0x8000表示未实现
+SUNSSF_MIN, SUNSSF_MAX = -10, 10  # SunSpec规定的缩放因子范围
+_POWERS_OF_TEN = tuple(10 ** n for n in range(SUNSSF_MAX + 1))
+
+
+def apply_scale_factor(value, sf):
+    """value × 10^sf；值或缩放因子无效（含未实现、超出-10~10）时返回None"""
+    if value is None or sf is None or not SUNSSF_MIN <= sf <= SUNSSF_MAX:
+        return None
+    if sf >= 0:
+        return value * _POWERS_OF_TEN[sf]
+    # 负缩放因子用除法，避免0.1等二进制浮点乘法误差
+    return value / _POWERS_OF_TEN[-sf]
+
+
+def parse_scale_reference(sf):
+    """
+    解析点定义中的sf：返回(引用的缩放因子点名, 常量缩放因子)，二者之一为None
+    sf可以是sunssf点名（如"AHRtg_SF"）或整数常量
+    """
+    if isinstance(sf, int):
+        return None, sf
+    text = str(sf).strip()
+    if text.lstrip('+-').isdigit():
+        return None, int(text)
+    return text, None
+
+
+def point_metadata(point, field_type):
+    """点的静态信息（与parse_table_data返回格式一致）"""
+    name = point['name']
+    return {
+        'unit': point.get('units', ''),
+        'type': field_type,
+        'label': point.get('label', name),
+        'description': point.get('desc', ''),
+        'access': 'rw' if 'access' in point and point['access'] == 'RW' else 'r'
+    }
+
+
+class ModelCodec:
+    """预编译的模型解码器"""
+
+    def __init__(self, model_data):
+        self.model_data = model_data
+        self.points = []  # [(name, offset, end, decoder), ...]
+        self.metadata = {}  # name -> 静态信息
+
+        current_offset = 0
+        for point in model_data['group']['points']:
+            name = point['name']
+            field_type = point['type'].lower()
+            size = point.get('size', 1)
+            offset = point.get('offset', current_offset)
+            decoder = TYPE_DECODERS.get(field_type, _decode_uint16)
+            self.points.append((name, offset, offset + size, decoder))
+            self.metadata[name] = point_metadata(point, field_type)
+            current_offset = offset + size
+        self.points = tuple(self.points)
+
+        # 缩放因子引用在编译时解析为寄存器偏移：(name, sf偏移, 常量sf)
+        offsets = {name: offset for name, offset, _, _ in self.points}
+        scale_points = []
+        for point in model_data['group']['points']:
+            if 'sf' not in point or point['name'] not in offsets:
+                continue
+            sf_name, sf_const = parse_scale_reference(point['sf'])
+            sf_offset = offsets.get(sf_name) if sf_name is not None else None
+            if sf_name is not None and sf_offset is None:
+                print(f"模型{model_data.get('id')}中点{point['name']}的缩放因子{sf_name}不存在")
+            scale_points.append((point['name'], sf_offset, sf_const))
+        self.scale_points = tuple(scale_points)
+
+        # 字段索引: name -> (offset, size, decoder)，单字段解析O(1)
+        self.index = {name: (offset, end - offset, decoder) for name, offset, end, decoder in self.points}
+        self.table_fields, self.total_registers = self.build_table_fields()
+        self.field_spans = tuple((field['offset'], field['size']) for field in self.table_fields.values())
+
+        # 重复组紧接在固定点之后，依次排列
+        self.point_offsets = offsets
+        self.fixed_length = max((end for _, _, end, _ in self.points), default=0)
+        self.groups = []
+        start = self.fixed_length
+        for group in model_data['group'].get('groups', []):
+            repeating = RepeatingGroup(group, start)
+            self.groups.append(repeating)
+            if isinstance(repeating.count, int) and repeating.count > 0:
+                start += repeating.count * repeating.row_size
+        self.groups = tuple(self.groups)
+        self.dependents, self.group_registers = self.build_dependents()
+
+    def build_table_fields(self):
+        """
+        生成get_table_info使用的字段表和总寄存器数（编译时只做一次）
+        offset规则与原get_table_info一致：有显式offset用显式值，否则按顺序累加
+        """
+        fields = {}
+        current_offset = 0
+        total_registers = 0
+        for point in self.model_data['group']['points']:
+            size = point.get('size', 1)
+            if 'offset' in point:
+                offset = point['offset']
+            else:
+                offset = current_offset
+                current_offset += size
+            total_registers += size
+            fields[point['name']] = {
+                'offset': offset,
+                'size': size,
+                'type': point['type'],
+                'scale': point.get('sf', 1),
+                'unit': point.get('units', ''),
+                'access': 'rw' if 'access' in point and point['access'] == 'RW' else 'r',
+                'label': point.get('label', point['name']),
+                'description': point.get('desc', '')
+            }
+        return fields, total_registers
+
+    def build_dependents(self):
+        """
+        寄存器偏移 -> 依赖它的点序号（点自身的寄存器和它引用的缩放因子寄存器），
+        以及重复组依赖的固定区寄存器，用于增量解码
+        """
+        dependents = [set() for _ in range(self.fixed_length)]
+        sf_offsets = {name: sf_offset for name, sf_offset, _ in self.scale_points}
+        for i, (name, offset, end, _) in enumerate(self.points):
+            for reg in range(offset, end):
+                dependents[reg].add(i)
+            if sf_offsets.get(name) is not None:
+                dependents[sf_offsets[name]].add(i)
+        group_registers = set()
+        for group in self.groups:
+            # 组内缩放因子、计数点，以及按L推算行数时的L寄存器
+            names = [sf_name for _, sf_name, _ in group.sf_refs]
+            if isinstance(group.count, str):
+                names.append(group.count)
+            elif not group.count:
+                group_registers.add(1)
+            group_registers.update(self.point_offsets[name] for name in names if name in self.point_offsets)
+        return tuple(tuple(sorted(points)) for points in dependents), frozenset(group_registers)
+
+    def decode_delta(self, data, previous):
+        """
+        增量解码：data/previous为同一模型前后两次的寄存器缓冲区(array('H'))，
+        只重新解析寄存器（或其缩放因子）发生变化的点，返回 {name: 字段信息}，格式同decode；
+        没有上一次缓冲区或长度变化时全量解码
+        """
+        if previous is None or len(previous) != len(data):
+            return self.decode(data)
+        changed = changed_offsets(data, previous)
+        if not changed:
+            return {}
+        fixed_length = self.fixed_length
+        indices = set()
+        groups_changed = False
+        for reg in changed:
+            if reg >= fixed_length:
+                groups_changed = True
+            else:
+                indices.update(self.dependents[reg])
+                if reg in self.group_registers:
+                    groups_changed = True
+
+        length = len(data)
+        metadata = self.metadata
+        result = {}
+        for i in sorted(indices):
+            name, offset, end, decoder = self.points[i]
+            value = decoder(data, offset, end) if end <= length else None
+            result[name] = {'value': value, 'raw': value, 'scaled': value, **metadata[name]}
+        if indices and self.scale_points:
+            for name, sf in self.resolve_scale_factors(data).items():
+                field = result.get(name)
+                if field is not None:
+                    field['sf'] = sf
+                    field['scaled'] = apply_scale_factor(field['raw'], sf)
+        if groups_changed:
+            result.update(self.decode_groups(data))
+        return result
+
+    def decode_field(self, name, data):
+        """
+        解析单个字段，data为该字段自身的寄存器（从0开始）
+        字段不存在或寄存器不足时返回None
+        """
+        entry = self.index.get(name)
+        if entry is None:
+            return None
+        offset, size, decoder = entry
+        if len(data) < size:
+            return None
+        if decoder in (_decode_uint32, _decode_int32) and size < 2:
+            return None
+        value = decoder(data, 0, size)
+        return {'value': value, 'raw': value, **self.metadata[name]}
+
+    def resolve_scale_factors(self, data):
+        """按编译好的引用取出各点的缩放因子 {name: sf}，取不到时为None"""
+        length = len(data)
+        factors = {}
+        for name, sf_offset, sf_const in self.scale_points:
+            if sf_offset is None:
+                factors[name] = sf_const
+            elif sf_offset < length:
+                sf = data[sf_offset]
+                factors[name] = sf - 65536 if sf > 32767 else sf
+            else:
+                factors[name] = None
+        return factors
+
+    def decode_values(self, data):
+        """只解析数值，返回 {name: value}，寄存器不足的点为None"""
+        length = len(data)
+        return {name: (decoder(data, offset, end) if end <= length else None)
+                for name, offset, end, decoder in self.points}
+
+    def decode_batch(self, snapshots, scaled=False):
+        """
+        批量解码多份寄存器快照（需要numpy）
+        snapshots: (N份快照 × L个寄存器) 的uint16数组
+        scaled: 为True时带缩放因子的点返回float64工程值（sf未实现或超出范围时为nan）
+        返回 {name: 长度为N的列数组}：
+        - uint16/enum16: uint16，int16/sunssf: int16（同一内存的视图）
+        - uint32/bitfield32: uint32，int32: int32（按大端字序重解释）
+        - string: 定长字节串数组(S{2*size})，与decode相同的低字节在前顺序
+        - hex: (N, 2*size)的uint8字节数组，按寄存器高字节在前
+        寄存器数不足的点不出现在结果中
+        """
+        if np is None:
+            raise ImportError("批量解码需要安装numpy")
+        regs = np.asarray(snapshots, dtype=np.uint16)
+        if regs.ndim == 1:
+            regs = regs.reshape(1, -1)
+        count, length = regs.shape
+        signed = regs.view(np.int16)
+        big_endian = regs.astype('>u2')  # 每个寄存器高字节在前，用于32位和hex
+        little_endian = regs.astype('<u2', copy=False)  # 字符串按低字节在前
+
+        columns = {}
+        for name, offset, end, decoder in self.points:
+            if end > length:
+                continue
+            if decoder is _decode_uint16:
+                columns[name] = regs[:, offset]
+            elif decoder is _decode_int16:
+                columns[name] = signed[:, offset]
+            elif decoder is _decode_uint32 or decoder is _decode_int32:
+                dtype = '>u4' if decoder is _decode_uint32 else '>i4'
+                pair = np.ascontiguousarray(big_endian[:, offset:offset + 2])
+                columns[name] = pair.view(dtype)[:, 0].astype(dtype[1:])
+            elif decoder is _decode_string:
+                block = np.ascontiguousarray(little_endian[:, offset:end])
+                columns[name] = block.view(f'S{2 * (end - offset)}')[:, 0]
+            else:
+                block = np.ascontiguousarray(big_endian[:, offset:end])
+                columns[name] = block.view(np.uint8).reshape(count, 2 * (end - offset))
+
+        if scaled:
+            for name, sf_offset, sf_const in self.scale_points:
+                if name not in columns:
+                    continue
+                if sf_offset is None:
+                    sf = np.full(count, float(sf_const))
+                elif sf_offset < length:
+                    sf = signed[:, sf_offset].astype(np.float64)
+                    sf[(sf < SUNSSF_MIN) | (sf > SUNSSF_MAX)] = np.nan
+                else:
+                    sf = np.full(count, np.nan)
+                columns[name] = columns[name] * np.power(10.0, sf)
+        return columns
+
+    def decode_points(self, data):
+        """
+        只解析固定点的原始值和静态信息 {name: {'value', 'raw', ...}}，
+        不换算缩放因子、不解码重复组（只需显示原始值时的快速路径）
+        """
+        length = len(data)
+        metadata = self.metadata
+        return {name: {'value': value, 'raw': value, **metadata[name]}
+                for name, value in ((name, decoder(data, offset, end) if end <= length else None)
+                                    for name, offset, end, decoder in self.points)}
+
+    def decode(self, data):
+        """
+        解析为与SunSpecProtocol.parse_table_data相同格式的字典
+        value/raw为原始值；scaled为按缩放因子换算后的工程值（无sf的点等于原始值），
+        sf为实际使用的缩放因子
+        """
+        length = len(data)
+        metadata = self.metadata
+        result = {}
+        for name, offset, end, decoder in self.points:
+            value = decoder(data, offset, end) if end <= length else None
+            result[name] = {'value': value, 'raw': value, 'scaled': value, **metadata[name]}
+        for name, sf in self.resolve_scale_factors(data).items():
+            field = result[name]
+            field['sf'] = sf
+            field['scaled'] = apply_scale_factor(field['raw'], sf)
+        if self.groups:
+            result.update(self.decode_groups(data))
+        return result
+
+    def group_spans(self, model_len):
+        """已知模型长度(L+2)时各重复组的相对区间 [(offset, size), ...]，行数为0的组省略"""
+        spans = []
+        for group in self.groups:
+            if not group.row_size:
+                continue
+            if isinstance(group.count, int) and group.count > 0:
+                count = group.count
+            else:
+                # 行数由计数点或L决定时，按模型剩余长度整块读取
+                count = max(0, (model_len - group.start) // group.row_size)
+            if count:
+                spans.append((group.start, count * group.row_size))
+        return spans
+
+    def decode_groups(self, data):
+        """
+        解码各重复组，返回 {组名: 字段信息}，其中
+        value/raw为每行一条记录的结构化数组（无numpy时为字典列表），
+        scaled为 {列名: 工程值列}，count为行数
+        """
+        factors = None
+        result = {}
+        for group in self.groups:
+            count = group.row_count(data, self.point_offsets)
+            rows = group.decode_rows(data, count)
+            if group.sf_refs and factors is None:
+                factors = self.resolve_named_factors(data)
+            result[group.name] = {
+                'value': rows, 'raw': rows,
+                'scaled': group.scale_rows(rows, factors) if group.sf_refs else {},
+                'count': count, 'unit': '', 'type': 'group', 'label': group.label,
+                'description': '', 'access': 'r', 'fields': group.metadata,
+            }
+        return result
+
+    def resolve_named_factors(self, data):
+        """按名称取出模型中所有sunssf点的值 {sf点名: sf}"""
+        factors = {}
+        length = len(data)
+        for name, offset, _, decoder in self.points:
+            if self.metadata[name]['type'] == 'sunssf' and offset < length:
+                sf = data[offset]
+                factors[name] = sf - 65536 if sf > 32767 else sf
+        return factors
+
+
+def changed_offsets(data, previous):
+    """
+    比较两份寄存器缓冲区(array('H'))，返回发生变化的寄存器偏移列表
+    整体相等时直接返回空列表；有numpy时用零拷贝视图向量化比较
+    """
+    if data == previous:
+        return []
+    if np is not None:
+        return np.flatnonzero(np.frombuffer(data, dtype=np.uint16) !=
+                              np.frombuffer(previous, dtype=np.uint16)).tolist()
+    return [i for i, (new, old) in enumerate(zip(data, previous)) if new != old]
+
+
+# 重复组字段类型 -> 结构化数组字段类型（寄存器按大端字节序展开）
+GROUP_FIELD_DTYPES = {
+    'uint16': '>u2', 'enum16': '>u2', 'int16': '>i2', 'sunssf': '>i2',
+    'uint32': '>u4', 'bitfield32': '>u4', 'int32': '>i4',
+}
+
+
+class RepeatingGroup:
+    """
+    重复组的编译结果：组内各点相对行首的偏移在编译时确定，
+    解码时整块寄存器按结构化dtype一次性解释，每行对应一次重复
+    """
+
+    def __init__(self, group, start):
+        self.name = group['name']
+        self.label = group.get('label', self.name)
+        self.start = start  # 第一行相对模型起始的偏移
+        # count: 正整数为固定行数，字符串为计数点名，0或缺省时由模型长度L推算
+        self.count = group.get('count', 0)
+        self.fields = []  # [(name, offset, size, field_type, decoder), ...]
+        offset = 0
+        for point in group['points']:
+            field_type = point['type'].lower()
+            size = point.get('size', 1)
+            offset = point.get('offset', offset)
+            self.fields.append((point['name'], offset, size, field_type,
+                                TYPE_DECODERS.get(field_type, _decode_uint16)))
+            offset += size
+        self.fields = tuple(self.fields)
+        self.row_size = max((offset + size for _, offset, size, _, _ in self.fields), default=0)
+        self.metadata = {point['name']: point_metadata(point, point['type'].lower()) for point in group['points']}
+        self.sf_refs = tuple((point['name'],) + parse_scale_reference(point['sf'])
+                             for point in group['points'] if 'sf' in point)
+        self.dtype = self.build_dtype()
+
+    def build_dtype(self):
+        """行的结构化dtype；字符串/hex字段保留为寄存器子数组，取值时再转换"""
+        if np is None or not self.row_size:
+            return None
+        names, formats, offsets = [], [], []
+        for name, offset, size, field_type, _ in self.fields:
+            names.append(name)
+            fmt = GROUP_FIELD_DTYPES.get(field_type)
+            if fmt is None or np.dtype(fmt).itemsize != 2 * size:
+                fmt = ('>u2', (size,)) if size > 1 else '>u2'
+            formats.append(fmt)
+            offsets.append(2 * offset)
+        return np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                         'itemsize': 2 * self.row_size})
+
+    def row_count(self, data, point_offsets):
+        """按count定义求行数，不超过data中实际可用的整行数"""
+        available = max(0, (len(data) - self.start) // self.row_size) if self.row_size else 0
+        count = self.count
+        if isinstance(count, str):
+            offset = point_offsets.get(count)
+            count = data[offset] if offset is not None and offset < len(data) else 0
+        elif not count:
+            # 模型长度L不含ID和L本身
+            count = (data[1] + 2 - self.start) // self.row_size if len(data) > 1 and self.row_size else 0
+        return max(0, min(count, available))
+
+    def decode_rows(self, data, count):
+        """
+        解码count行：有numpy时返回结构化数组（一次性视图转换），
+        否则返回 [{name: value}, ...]
+        """
+        end = self.start + count * self.row_size
+        if self.dtype is not None:
+            block = np.asarray(data[self.start:end], dtype='>u2')
+            return np.frombuffer(block.tobytes(), dtype=self.dtype, count=count)
+        rows = []
+        for row in range(count):
+            base = self.start + row * self.row_size
+            rows.append({name: decoder(data, base + offset, base + offset + size)
+                         for name, offset, size, _, decoder in self.fields})
+        return rows
+
+    def scale_rows(self, rows, factors):
+        """按缩放因子换算组内各列，返回 {name: 工程值列}"""
+        scaled = {}
+        for name, sf_name, sf_const in self.sf_refs:
+            sf = factors.get(sf_name) if sf_name is not None else sf_const
+            if self.dtype is not None:
+                column = rows[name].astype(np.float64)
+                scaled[name] = column * (10.0 ** sf) if sf is not None and SUNSSF_MIN <= sf <= SUNSSF_MAX \
+                    else np.full(len(rows), np.nan)
+            else:
+                scaled[name] = [apply_scale_factor(row[name], sf) for row in rows]
+        return scaled
+
+
+def compile_model(model_data):
+    """把模型JSON数据编译为ModelCodec"""
+    return ModelCodec(model_data)
+
+
+def interpret_points(model_data, data):
+    """
+    逐点解释模型JSON的参考实现（编译前parse_table_data的逻辑），
+    用于基准测试和结果比对
+    """
+    points = model_data['group']['points']
+    parsed_data = {}
+    current_offset = 0
+    for point in points:
+        name = point['name']
+        field_type = point['type'].lower()
+        size = point.get('size', 1)
+        offset = point.get('offset', current_offset)
+        value = None
+        if offset + size <= len(data):
+            regs = data[offset:offset+size]
+            if field_type == 'uint16' or field_type == 'enum16':
+                value = regs[0]
+            elif field_type in ['sunssf', 'int16']:
+                value = regs[0] - 65536 if regs[0] > 32767 else regs[0]
+            elif field_type in ['uint32', 'bitfield32']:
+                value = (regs[0] << 16) | regs[1]
+            elif field_type == 'int32':
+                value = (regs[0] << 16) | regs[1]
+                if value > 0x7FFFFFFF:
+                    value = value - 0x100000000
+            elif field_type == 'string':
+                chars = []
+                for reg in regs:
+                    chars.append(chr(reg & 0xFF))
+                    chars.append(chr((reg >> 8) & 0xFF))
+                value = ''.join(chars).rstrip('\x00').strip()
+            elif field_type == "hex":
+                value = ' '.join(f"{reg:04X}" for reg in regs)
+            else:
+                value = regs[0]
+        parsed_data[name] = {
+            'value': value,
+            'raw': value,
+            'unit': point.get('units', ''),
+            'type': field_type,
+            'label': point.get('label', name),
+            'description': point.get('desc', ''),
+            'access': 'rw' if 'access' in point and point['access'] == 'RW' else 'r'
+        }
+        current_offset = offset + size
+    return parsed_data
+
+
+def benchmark_codecs(model_ids=(802, 805, 899, 64001), number=2000):
+    """
+    编译解码器与逐点解释的基准对比
+    逐点解释只做原始值和静态信息，与之对比的是做同样工作的decode_points；
+    decode还要换算缩放因子、解码重复组，单独列出
+    返回 {model_id: (解释耗时us, decode_points耗时us, decode耗时us)}
+    """
+    import json
+    results = {}
+    for model_id in model_ids:
+        with open(f'model_{model_id}.json', 'r', encoding='utf-8') as f:
+            model_data = json.load(f)
+        codec = compile_model(model_data)
+        length = max(end for _, _, end, _ in codec.points)
+        data = [(i * 2654435761) & 0xFFFF for i in range(length)]
+        if codec.decode_points(data) != interpret_points(model_data, data):
+            raise AssertionError(f"模型{model_id}编译解码结果与参考实现不一致")
+        interp = timeit.timeit(lambda: interpret_points(model_data, data), number=number)
+        points = timeit.timeit(lambda: codec.decode_points(data), number=number)
+        full = timeit.timeit(lambda: codec.decode(data), number=number)
+        results[model_id] = (interp / number * 1e6, points / number * 1e6, full / number * 1e6)
+    return results
+
+
+if __name__ == '__main__':
+    for model_id, (interp, points, full) in benchmark_codecs().items():
+        print(f"模型{model_id}: 逐点解释 {interp:8.1f} us  编译解码 {points:8.1f} us  ({interp / points:4.1f}x)  "
+              f"含缩放/重复组 {full:8.1f} us")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SunSpec设备与模型链发现模块
+
+模型链扫描：逐个读取模型头(ID/L)需要每个模型一次往返。这里改为从基地址开始
+按最大长度预读寄存器窗口，从已读到的缓冲区里尽可能多地解析模型头，只有当
+下一个模型头落在已读范围之外时才发起新的读取。
+设备拒绝越过寄存器映射末尾的读取时，本次扫描余下部分退回只读取模型头，
+因此最多比逐个读取模型头多一次（被拒绝的）读取。
+
+总线扫描：对从站ID 1~247逐轮探测候选基地址，使用专用短超时；
+某个从站完全无响应（或TCP网关返回异常码0x0A/0x0B，表示该单元不存在）时不再探测其余候选地址，
+返回其它异常码说明设备在线，继续下一个候选。
+TCP下每批请求以流水线方式并发发送。扫描可按批分步执行(step)，
+每步只占用总线一批请求的时间，便于在请求队列中与写入等操作交替执行。
+"""
+
+from modbus_client import build_read_request, decode_registers, check_response
+from modbus_transport import rtu_char_time
+from read_planner import MAX_READ_REGISTERS
+from sunspec_codec import TYPE_DECODERS
+
+CHAIN_END_ID = 0xFFFF  # 结束标记: ID=0xFFFF, L=0
+MAX_CHAIN_MODELS = 256  # 防止错误数据导致无限循环
+SUNSPEC_MARKER = "SunS"
+CANDIDATE_BASE_ADDRESSES = (0, 40000, 50000)
+SLAVE_IDS = range(1, 248)
+SCAN_BATCH_SIZE = 16  # 每步探测的从站数（RTU下全部无响应时约1.6s）
+GATEWAY_EXCEPTIONS = (0x0A, 0x0B)  # 网关路径不可用/目标设备无响应
+COMMON_INFO_COUNT = 4 + 64  # "SunS" + 模型头 + Common模型Mn/Md/Opt/Vr/SN
+
+
+def is_offline_response(resp):
+    """无响应，或网关返回"目标不存在"类异常码"""
+    return resp is None or (len(resp) >= 2 and bool(resp[0] & 0x80) and resp[1] in GATEWAY_EXCEPTIONS)
+
+
+def is_sunspec_marker(regs):
+    """前两个寄存器是否为"SunS"标记"""
+    return bool(regs) and len(regs) >= 2 and TYPE_DECODERS['string'](regs, 0, 2) == SUNSPEC_MARKER
+
+
+class ModelChainScanner:
+    """模型链扫描器"""
+
+    def __init__(self, read_func, window=MAX_READ_REGISTERS, log=None):
+        """
+        read_func: (address, count) -> 寄存器列表，失败返回None
+        window: 预读窗口大小（寄存器数）
+        log: 日志回调，可为None
+        """
+        self.read_func = read_func
+        self.window = max(2, min(window, MAX_READ_REGISTERS))
+        self.current_window = self.window  # 本次扫描使用的窗口，被拒绝后降为2
+        self.log = log or (lambda msg: None)
+        self.buffer_addr = 0
+        self.buffer = []
+        self.read_count = 0
+
+    def fetch(self, address):
+        """
+        从address开始预读一个窗口，返回是否成功
+        窗口越过设备映射末尾时读取会被拒绝，此时改读模型头(2个寄存器)，
+        本次扫描之后也只读模型头，避免每个模型都再试一次窗口（RTU下设备不响应时每次都要等超时）
+        """
+        if self.current_window > 2:
+            self.read_count += 1
+            regs = self.read_func(address, self.current_window)
+            if regs and len(regs) >= 2:
+                self.buffer_addr = address
+                self.buffer = list(regs)
+                return True
+            self.log(f"预读{self.current_window}个寄存器被拒绝，地址: {address}，改为只读模型头")
+            self.current_window = 2
+        self.read_count += 1
+        regs = self.read_func(address, 2)
+        if regs and len(regs) >= 2:
+            self.buffer_addr = address
+            self.buffer = list(regs)
+            return True
+        return False
+
+    def header_at(self, address):
+        """取出address处的模型头(ID, L)，不在缓冲区内时发起读取"""
+        offset = address - self.buffer_addr
+        if offset < 0 or offset + 2 > len(self.buffer):
+            if not self.fetch(address):
+                return None
+            offset = 0
+        return self.buffer[offset], self.buffer[offset + 1]
+
+    def scan(self, base_address):
+        """
+        扫描模型链
+        返回 (model_map, model_lengths, chain_end)
+        model_map: {model_id: 模型头地址}，model_lengths: {model_id: L}
+        chain_end: 结束标记地址，未读到结束标记时为None
+        """
+        self.buffer_addr = base_address
+        self.buffer = []
+        self.read_count = 0
+        self.current_window = self.window
+        addr = base_address + 2  # 跳过"SunS"
+        model_map = {}
+        model_lengths = {}
+        chain_end = None
+
+        for _ in range(MAX_CHAIN_MODELS):
+            header = self.header_at(addr)
+            if header is None:
+                self.log(f"读取模型ID/LEN失败，地址: {addr}")
+                break
+            model_id, model_len = header
+            self.log(f"模型ID: {model_id} LEN: {model_len} @ {addr}")
+            if model_id == CHAIN_END_ID and model_len == 0:
+                chain_end = addr
+                self.log("模型链表结束")
+                break
+            model_map[model_id] = addr
+            model_lengths[model_id] = model_len
+            addr = addr + 2 + model_len
+        return model_map, model_lengths, chain_end
+
+
+def discover_models(read_func, base_address, window=MAX_READ_REGISTERS, log=None):
+    """便捷函数：扫描base_address处的模型链，返回 (model_map, model_lengths, chain_end)"""
+    return ModelChainScanner(read_func, window, log).scan(base_address)
+
+
+class BusScanner:
+    """总线扫描器：找出总线上所有SunSpec设备"""
+
+    def __init__(self, modbus_client, candidates=CANDIDATE_BASE_ADDRESSES, slave_ids=SLAVE_IDS,
+                 timeout=0.1, log=None, batch_size=SCAN_BATCH_SIZE):
+        self.client = modbus_client
+        self.candidates = tuple(candidates)
+        self.slave_ids = list(slave_ids)
+        self.timeout = timeout
+        self.log = log or (lambda msg: None)
+        self.batch_size = max(1, batch_size)
+        self.request_count = 0
+        self.steps = None
+        self.inventory = None  # 分步扫描完成后的设备清单
+
+    def read_many(self, targets, count):
+        """targets: [(slave_id, address), ...]，返回原始响应PDU列表"""
+        requests = []
+        for slave_id, address in targets:
+            pdu, resp_pdu_len = build_read_request(0x03, address, count)
+            requests.append((slave_id, pdu, resp_pdu_len))
+        self.request_count += len(requests)
+        return requests, self.client.transact_many(requests, timeout=self.response_timeout(count))
+
+    def response_timeout(self, count):
+        """
+        读count个寄存器的超时：探测用的短超时只够2个寄存器的响应，
+        串口下再加上响应帧(5+2*count字节)的传输时间；非串口连接读长数据时使用连接超时
+        """
+        baudrate = getattr(self.client.transport, 'baudrate', None)
+        if baudrate:
+            return self.timeout + (5 + 2 * count) * rtu_char_time(baudrate)
+        return self.timeout if count <= 2 else None
+
+    def probe(self, address, slave_ids):
+        """
+        在address探测一批从站的"SunS"标记
+        返回 ({slave_id: address} 找到的, [在线但未找到的slave_id])
+        """
+        found = {}
+        online = []
+        requests, responses = self.read_many([(slave_id, address) for slave_id in slave_ids], 2)
+        for slave_id, (_, pdu, resp_pdu_len), resp in zip(slave_ids, requests, responses):
+            if is_offline_response(resp):
+                # 该从站不在线，跳过其余候选地址
+                continue
+            regs = check_response(pdu, resp, resp_pdu_len)
+            if regs is not None and is_sunspec_marker(decode_registers(regs, 2)):
+                found[slave_id] = address
+                self.log(f"从站{slave_id}: 发现SunSpec基地址 {address}")
+            else:
+                online.append(slave_id)
+        return found, online
+
+    def base_address_steps(self, found):
+        """逐批探测基地址的生成器，每完成一批请求yield一次，结果写入found"""
+        remaining = list(self.slave_ids)
+        for address in self.candidates:
+            online = []
+            for i in range(0, len(remaining), self.batch_size):
+                batch_found, batch_online = self.probe(address, remaining[i:i + self.batch_size])
+                found.update(batch_found)
+                online.extend(batch_online)
+                yield
+            remaining = online
+
+    def find_base_addresses(self):
+        """返回 {slave_id: 基地址}"""
+        found = {}
+        for _ in self.base_address_steps(found):
+            pass
+        return found
+
+    def read_common_info(self, base_addresses):
+        """读取各设备Common模型中的厂商/型号/序列号"""
+        targets = sorted(base_addresses.items())
+        requests, responses = self.read_many(targets, COMMON_INFO_COUNT)
+        info = {}
+        for (slave_id, address), (_, pdu, resp_pdu_len), resp in zip(targets, requests, responses):
+            resp = check_response(pdu, resp, resp_pdu_len)
+            regs = None if resp is None else decode_registers(resp, COMMON_INFO_COUNT)
+            if regs is None or regs[2] != 1:
+                info[slave_id] = {}
+                continue
+            decode_string = TYPE_DECODERS['string']
+            info[slave_id] = {
+                'manufacturer': decode_string(regs, 4, 20),
+                'model': decode_string(regs, 20, 36),
+                'serial_number': decode_string(regs, 52, 68),
+            }
+        return info
+
+    def scan_steps(self):
+        """完整扫描的生成器，每完成一批请求yield一次，结束时结果在self.inventory"""
+        self.request_count = 0
+        base_addresses = {}
+        yield from self.base_address_steps(base_addresses)
+        info = {}
+        targets = sorted(base_addresses.items())
+        for i in range(0, len(targets), self.batch_size):
+            info.update(self.read_common_info(dict(targets[i:i + self.batch_size])))
+            yield
+        inventory = []
+        for slave_id, address in sorted(base_addresses.items()):
+            device = {'slave_id': slave_id, 'base_address': address,
+                      'manufacturer': '', 'model': '', 'serial_number': ''}
+            device.update(info.get(slave_id, {}))
+            inventory.append(device)
+        self.inventory = inventory
+
+    def step(self):
+        """
+        执行扫描的下一批请求，还有后续步骤时返回True，扫描完成返回False
+        （结果在self.inventory）。供请求队列逐批提交，避免整次扫描长时间独占总线
+        """
+        if self.steps is None:
+            self.inventory = None
+            self.steps = self.scan_steps()
+        try:
+            next(self.steps)
+            return True
+        except StopIteration:
+            self.steps = None
+            return False
+
+    def scan(self):
+        """
+        扫描总线，返回设备清单
+        [{'slave_id', 'base_address', 'manufacturer', 'model', 'serial_number'}, ...]
+        """
+        while self.step():
+            pass
+        return self.inventory
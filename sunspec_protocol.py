@@ -4,23 +4,144 @@
 SunSpec协议解析模块 - 支持model_xxx.json格式
 """
 
-import json
 import os
+from array import array
+from collections.abc import MutableMapping
+from sunspec_codec import compile_model
+from model_cache import ModelCache
+
+
+class LazyModelMap(MutableMapping):
+    """
+    按需加载的模型表: table_id -> 模型JSON数据
+    - register()只登记模型文件，首次访问某个模型时才加载并编译
+    - 文件不存在或加载失败的模型记入负缓存，只提示一次，之后不再尝试
+    - 遍历/计数只检查文件是否存在，不加载模型
+    - refresh()丢弃模型文件已被修改的已加载模型，下次访问时重新加载
+    """
+
+    def __init__(self, loader, resolve_path, is_stale=None):
+        self.loader = loader  # filepath -> ModelCodec
+        self.resolve_path = resolve_path  # filename -> filepath
+        self.is_stale = is_stale  # filepath -> 文件是否已在加载后被修改
+        self.files = {}  # table_id -> 文件名
+        self.loaded = {}  # table_id -> 模型数据
+        self.codecs = {}  # table_id -> ModelCodec
+        self.sources = {}  # table_id -> 加载时的文件路径（直接赋值的模型没有）
+        self.missing = set()  # 负缓存
+
+    def register(self, table_id, filename):
+        if self.files.get(table_id) != filename:
+            self.files[table_id] = filename
+            self.missing.discard(table_id)
+
+    def load(self, table_id):
+        filename = self.files.get(table_id)
+        if filename is None or table_id in self.missing:
+            return None
+        filepath = self.resolve_path(filename)
+        try:
+            codec = self.loader(filepath)
+        except FileNotFoundError:
+            print(f"模型文件 {filename} 不存在，跳过。")
+            self.missing.add(table_id)
+            return None
+        except Exception as e:
+            print(f"加载模型文件 {filename} 失败: {e}")
+            self.missing.add(table_id)
+            return None
+        self.loaded[table_id] = codec.model_data
+        self.codecs[table_id] = codec
+        self.sources[table_id] = filepath
+        return codec.model_data
+
+    def refresh(self):
+        """
+        检查从文件加载的模型，文件已修改、删除或登记的文件名已变更的丢弃已加载数据和解码器，
+        并清空负缓存以便重新尝试；返回被丢弃的table_id列表
+        """
+        self.missing.clear()
+        if self.is_stale is None:
+            return []
+        stale = [table_id for table_id, filepath in self.sources.items()
+                 if filepath != self.resolve_path(self.files.get(table_id, '')) or self.is_stale(filepath)]
+        for table_id in stale:
+            self.loaded.pop(table_id, None)
+            self.codecs.pop(table_id, None)
+            self.sources.pop(table_id, None)
+        return stale
+
+    def is_loaded(self, table_id):
+        return table_id in self.loaded
+
+    def __getitem__(self, table_id):
+        model_data = self.loaded.get(table_id)
+        if model_data is None:
+            model_data = self.load(table_id)
+            if model_data is None:
+                raise KeyError(table_id)
+        return model_data
+
+    def __setitem__(self, table_id, model_data):
+        self.loaded[table_id] = model_data
+        self.sources.pop(table_id, None)
+        self.missing.discard(table_id)
+
+    def __delitem__(self, table_id):
+        self.loaded.pop(table_id, None)
+        self.codecs.pop(table_id, None)
+        self.sources.pop(table_id, None)
+        if self.files.pop(table_id, None) is None:
+            raise KeyError(table_id)
+
+    def __contains__(self, table_id):
+        if table_id in self.loaded:
+            return True
+        return self.load(table_id) is not None
+
+    def available(self, table_id):
+        """不加载模型，只判断模型文件是否可用"""
+        if table_id in self.loaded:
+            return True
+        if table_id not in self.files or table_id in self.missing:
+            return False
+        if os.path.exists(self.resolve_path(self.files[table_id])):
+            return True
+        self.missing.add(table_id)
+        return False
+
+    def __iter__(self):
+        seen = set()
+        for table_id in list(self.files) + list(self.loaded):
+            if table_id not in seen and self.available(table_id):
+                seen.add(table_id)
+                yield table_id
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
 
 class SunSpecProtocol:
     """SunSpec协议解析类"""
 
     def __init__(self, model_dir='.'):
         self.model_dir = model_dir
-        self.models = {}
+        self.model_cache = ModelCache(os.path.join(model_dir, '.model_cache'))
+        # 模型按需加载，首次访问时才解析/编译
+        self.models = LazyModelMap(self.model_cache.load, self.get_resource_path, self.model_cache.is_stale)
+        self.codecs = self.models.codecs  # table_id -> 预编译的ModelCodec
         self.base_address = 0  # 默认0，可被扫描覆盖
         self.model_base_addrs = {}  # 新增：保存扫描到的模型地址
+        self.model_lengths = {}  # 扫描到的模型长度L（不含ID/L两个寄存器）
+        self.model_chain_end = None  # 模型链表结束标记(0xFFFF, 0)的地址
+        self.delta_buffers = {}  # table_id -> 上一次解析的寄存器缓冲区，用于增量解析
         self.load_models()
 
     def load_models(self, available_models=None):
         """
-        加载模型定义。
-        available_models: 可用模型ID列表（如[ 802, 805, 899]），为None时加载全部支持的。
+        登记模型定义，实际加载推迟到首次访问self.models[table_id]时。
+        已加载的模型若文件已被修改则丢弃，下次访问时重新加载编译。
+        available_models: 可用模型ID列表（如[ 802, 805, 899]），为None时登记全部支持的。
         """
         # 支持的模型及其文件名
         default_model_files = {
@@ -42,16 +163,9 @@ class SunSpecProtocol:
             model_files = default_model_files
 
         for table_id, filename in model_files.items():
-            try:
-                filepath = self.get_resource_path(filename)
-                if not os.path.exists(filepath):
-                    print(f"模型文件 {filename} 不存在，跳过。")
-                    continue
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    model_data = json.load(f)
-                    self.models[table_id] = model_data
-            except Exception as e:
-                print(f"加载模型文件 {filename} 失败: {e}")
+            self.models.register(table_id, filename)
+        for table_id in self.models.refresh():
+            self.delta_buffers.pop(table_id, None)
 
     def get_resource_path(self, filename):
         """获取资源文件路径，支持打包后的路径"""
@@ -66,242 +180,197 @@ class SunSpecProtocol:
             # 如果是开发环境
             return filename
 
+    def get_codec(self, table_id):
+        """获取模型的预编译解码器（首次访问时加载），模型数据被替换时重新编译"""
+        model_data = self.models.get(table_id)
+        if model_data is None:
+            return None
+        codec = self.codecs.get(table_id)
+        if codec is None or codec.model_data is not model_data:
+            codec = compile_model(model_data)
+            self.codecs[table_id] = codec
+        return codec
+
     def parse_table_data(self, table_id, data):
-        """解析表格数据，支持model_xxx.json格式"""
-        if table_id not in self.models:
+        """解析表格数据，支持model_xxx.json格式（使用预编译解码器）"""
+        codec = self.get_codec(table_id)
+        if codec is None:
             return None
-            
-        model_data = self.models[table_id]
-        points = model_data['group']['points']
-        parsed_data = {}
-
-        # 解析所有字段
-        current_offset = 0
-        for point in points:
-            name = point['name']
-            field_type = point['type'].lower()
-            size = point.get('size', 1)
-            offset = point.get('offset', current_offset)
-            raw_value = None
-            value = None
-
-            # 取出对应寄存器
-            if offset + size <= len(data):
-                regs = data[offset:offset+size]
-                # 解析类型
-                if field_type in ['uint16', 'sunssf']:
-                    raw_value = regs[0]
-                    if field_type == 'sunssf' or field_type == 'int16':
-                        # 有符号
-                        if raw_value > 32767:
-                            raw_value = raw_value - 65536
-                    value = raw_value
-                elif field_type == 'int16':
-                    raw_value = regs[0]
-                    if raw_value > 32767:
-                        raw_value = raw_value - 65536
-                    value = raw_value
-                elif field_type == 'uint32':
-                    raw_value = (regs[0] << 16) | regs[1]
-                    value = raw_value
-                elif field_type == 'int32':
-                    raw_value = (regs[0] << 16) | regs[1]
-                    if raw_value > 0x7FFFFFFF:
-                        raw_value = raw_value - 0x100000000
-                    value = raw_value
-                elif field_type == 'enum16':
-                    # enum16 使用1个寄存器，按uint16解析
-                    raw_value = regs[0]
-                    value = raw_value
-                elif field_type == 'bitfield32':
-                    # bitfield32 使用2个寄存器，按uint32解析
-                    raw_value = (regs[0] << 16) | regs[1]
-                    value = raw_value
-                elif field_type == 'string':
-                    # 每个寄存器2字节，拼接为字符串
-                    chars = []
-                    for reg in regs:
-                        chars.append(chr(reg & 0xFF))
-                        chars.append(chr((reg >> 8) & 0xFF))
-                    value = ''.join(chars).rstrip('\x00').strip()
-                    raw_value = value
-                elif field_type == "hex":
-                    # hex类型：直接显示16进制数据
-                    hex_values = []
-                    for reg in regs:
-                        hex_values.append(f"{reg:04X}")
-                    value = ' '.join(hex_values)  # 用空格分隔多个寄存器
-                    raw_value = value
-                else:
-                    # 其他类型直接显示原始
-                    value = regs[0]
-                    raw_value = regs[0]
-            else:
-                value = None
-                raw_value = None
-
-            # 移除缩放因子处理，统一显示原始值
-            parsed_data[name] = {
-                'value': value,
-                'raw': raw_value,
-                'unit': point.get('units', ''),
-                'type': field_type,
-                'label': point.get('label', name),
-                'description': point.get('desc', ''),
-                'access': 'rw' if 'access' in point and point['access'] == 'RW' else 'r'
-            }
-            
-            current_offset = offset + size
-
-        return parsed_data
+        # value仍为原始值用于显示，缩放后的工程值在scaled中
+        return codec.decode(data)
+
+    def parse_table_delta(self, table_id, data):
+        """
+        增量解析：与该表格上一次的寄存器缓冲区比较，只返回发生变化的字段 {name: 字段信息}
+        第一次调用（或reset_delta之后）返回全部字段
+        """
+        codec = self.get_codec(table_id)
+        if codec is None:
+            return None
+        buffer = array('H', data)
+        changed = codec.decode_delta(buffer, self.delta_buffers.get(table_id))
+        self.delta_buffers[table_id] = buffer
+        return changed
+
+    def reset_delta(self, table_id=None):
+        """丢弃增量解析的基准缓冲区，下一次parse_table_delta返回全部字段"""
+        if table_id is None:
+            self.delta_buffers.clear()
+        else:
+            self.delta_buffers.pop(table_id, None)
+
+    def decode_batch(self, table_id, snapshots, scaled=False):
+        """
+        批量解码同一模型的多份原始寄存器快照（离线分析用，需要numpy）
+        snapshots: (N × L) uint16数组，返回 {字段名: 长度为N的列数组}
+        scaled为True时带缩放因子的点返回工程值
+        """
+        codec = self.get_codec(table_id)
+        if codec is None:
+            return None
+        return codec.decode_batch(snapshots, scaled)
 
     def parse_single_field(self, table_id, field_name, data):
-        """解析单个字段，根据type和size解析"""
-        if table_id not in self.models:
+        """解析单个字段，根据type和size解析（按字段索引O(1)查找）"""
+        codec = self.get_codec(table_id)
+        if codec is None:
             return None
-            
-        model_data = self.models[table_id]
-        points = model_data['group']['points']
-        
-        # 找到指定字段
-        for point in points:
-            if point['name'] == field_name:
-                field_type = point['type'].lower()
-                size = point.get('size', 1)
-                
-                # 检查数据长度是否足够
-                if len(data) < size:
-                    return None
-                
-                # 根据类型解析
-                if field_type in ['uint16', 'sunssf']:
-                    raw_value = data[0]
-                    if field_type == 'sunssf':
-                        # sunssf是有符号的
-                        if raw_value > 32767:
-                            raw_value = raw_value - 65536
-                    value = raw_value
-                    
-                elif field_type == 'int16':
-                    raw_value = data[0]
-                    if raw_value > 32767:
-                        raw_value = raw_value - 65536
-                    value = raw_value
-                    
-                elif field_type == 'uint32':
-                    if size >= 2:
-                        raw_value = (data[0] << 16) | data[1]
-                        value = raw_value
-                    else:
-                        return None
-                        
-                elif field_type == 'int32':
-                    if size >= 2:
-                        raw_value = (data[0] << 16) | data[1]
-                        if raw_value > 0x7FFFFFFF:
-                            raw_value = raw_value - 0x100000000
-                        value = raw_value
-                    else:
-                        return None
-                        
-                elif field_type == 'enum16':
-                    # enum16 使用1个寄存器，按uint16解析
-                    raw_value = data[0]
-                    value = raw_value
-                    
-                elif field_type == 'bitfield32':
-                    # bitfield32 使用2个寄存器，按uint32解析
-                    if size >= 2:
-                        raw_value = (data[0] << 16) | data[1]
-                        value = raw_value
-                    else:
-                        return None
-                        
-                elif field_type == 'string':
-                    # 字符串解析：每个寄存器2字节
-                    chars = []
-                    for reg in data:
-                        chars.append(chr(reg & 0xFF))
-                        chars.append(chr((reg >> 8) & 0xFF))
-                    value = ''.join(chars).rstrip('\x00').strip()
-                    raw_value = value
-                    
-                elif field_type == "hex":
-                    # hex类型：直接显示16进制数据
-                    hex_values = []
-                    for reg in data:
-                        hex_values.append(f"{reg:04X}")
-                    value = ' '.join(hex_values)  # 用空格分隔多个寄存器
-                    raw_value = value
-                    
-                else:
-                    # 其他类型直接显示原始
-                    value = data[0]
-                    raw_value = data[0]
-                
-                # 移除缩放因子处理，统一显示原始值
-                return {
-                    'value': value,
-                    'raw': raw_value,
-                    'unit': point.get('units', ''),
-                    'type': field_type,
-                    'label': point.get('label', field_name),
-                    'description': point.get('desc', ''),
-                    'access': 'rw' if 'access' in point and point['access'] == 'RW' else 'r'
-                }
-        
-        return None
+        # 移除缩放因子处理，统一显示原始值
+        return codec.decode_field(field_name, data)
 
-    def set_model_base_address(self, model_id, address):
-        """设置特定模型的基地址"""
+    def set_model_base_address(self, model_id, address, length=None):
+        """设置特定模型的基地址，length为扫描到的模型长度L"""
         self.model_base_addrs[model_id] = address
+        if length is not None:
+            self.model_lengths[model_id] = length
 
-    def get_table_info(self, table_id):
-        """获取表格信息，转换为兼容格式"""
-        if table_id not in self.models:
+    def clear_model_addresses(self):
+        """清除扫描到的模型地址、长度和链表结束地址"""
+        self.model_base_addrs.clear()
+        self.model_lengths.clear()
+        self.model_chain_end = None
+        self.delta_buffers.clear()
+
+    def get_device_map_end(self):
+        """
+        SunSpec地址映射的结束地址（含结束标记的两个寄存器）
+        未扫描或缺少模型长度时返回None
+        """
+        if self.base_address is None or not self.model_base_addrs:
             return None
-            
-        model_data = self.models[table_id]
-        points = model_data['group']['points']
-        
-        # 转换为兼容格式，计算正确的offset
-        fields = {}
-        current_offset = 0
-        total_registers = 0  # 新增：计算总寄存器数
-        
-        for point in points:
-            # 如果没有显式定义offset，则按顺序计算
-            if 'offset' in point:
-                offset = point['offset']
+        if self.model_chain_end is not None:
+            return self.model_chain_end + 2
+        if any(model_id not in self.model_lengths for model_id in self.model_base_addrs):
+            return None
+        return max(addr + 2 + self.model_lengths[model_id] for model_id, addr in self.model_base_addrs.items())
+
+    def snapshot_device(self, modbus_client):
+        """
+        一次性读取整个SunSpec地址映射（从base_address到结束标记），
+        以尽量少的最大长度请求完成，再切分为各模型的寄存器视图。
+        返回 {model_id: memoryview}（零拷贝切片，可直接交给parse_table_data），
+        无法确定映射范围或读取失败时返回None
+        """
+        end = self.get_device_map_end()
+        if end is None:
+            return None
+        regs = modbus_client.read_holding_registers_block(self.base_address, end - self.base_address)
+        if regs is None:
+            return None
+        snapshot = memoryview(array('H', regs))
+        views = {}
+        for model_id, addr in self.model_base_addrs.items():
+            start = addr - self.base_address
+            if model_id in self.model_lengths:
+                length = 2 + self.model_lengths[model_id]
             else:
-                offset = current_offset
-                current_offset += point.get('size', 1)  # 累加字段大小
-            
-            # 累加寄存器数量
-            total_registers += point.get('size', 1)
-            
-            fields[point['name']] = {
-                'offset': offset,
-                'size': point.get('size', 1),
-                'type': point['type'],
-                'scale': point.get('sf', 1),
-                'unit': point.get('units', ''),
-                'access': 'rw' if 'access' in point and point['access'] == 'RW' else 'r',
-                'label': point.get('label', point['name']),
-                'description': point.get('desc', '')
-            }
+                table_info = self.get_table_info(model_id)
+                length = table_info['length'] if table_info else 2
+            views[model_id] = snapshot[start:start + length]
+        return views
+
+    def get_table_info(self, table_id):
+        """
+        获取表格信息，转换为兼容格式
+        字段表和总寄存器数在模型编译时生成，这里只补上当前基地址
+        """
+        codec = self.get_codec(table_id)
+        if codec is None:
+            return None
+        label = codec.model_data['group'].get('label', f'Model {table_id}')
         
         # 使用扫描到的模型地址，如果没有则使用默认基地址
         base_addr = self.model_base_addrs.get(table_id, self.base_address)
         
+        # 含重复组的模型，长度以扫描到的L为准
+        length = codec.total_registers
+        if table_id in self.model_lengths:
+            length = max(length, self.model_lengths[table_id] + 2)
+        
         return {
-            'name': model_data['group'].get('label', f'Model {table_id}'),
-            'description': model_data['group'].get('label', f'Model {table_id}'),
+            'name': label,
+            'description': label,
             'base_address': base_addr,
-            'length': total_registers,  # 修改：使用总寄存器数
-            'fields': fields
+            'length': length,  # 修改：使用总寄存器数
+            'fields': codec.table_fields,
+            'groups': {group.name: {'offset': group.start, 'row_size': group.row_size, 'count': group.count}
+                       for group in codec.groups}
         }
 
+    def get_field_spans(self, table_id, field_names=None):
+        """获取表格各字段的绝对寄存器区间 [(address, size), ...]"""
+        table_info = self.get_table_info(table_id)
+        if not table_info:
+            return []
+        base_addr = table_info['base_address']
+        if field_names is None:
+            # 相对区间在模型编译时已算好；重复组区间取决于扫描到的模型长度
+            codec = self.get_codec(table_id)
+            spans = list(codec.field_spans)
+            if codec.groups and table_id in self.model_lengths:
+                spans.extend(codec.group_spans(self.model_lengths[table_id] + 2))
+            return [(base_addr + offset, size) for offset, size in spans]
+        fields = table_info['fields']
+        return [(base_addr + fields[name]['offset'], fields[name]['size']) for name in field_names if name in fields]
+
+    def read_tables(self, modbus_client, table_ids, max_gap=None):
+        """
+        按读取计划读取多个表格
+        所有表格的字段区间统一规划：相邻字段/模型合并为一次请求，超过125寄存器时
+        在字段边界处切分。返回 {table_id: 连续寄存器列表}，可直接交给parse_table_data；
+        任一字段读取失败的表格结果为None
+        """
+        requests = {}
+        spans = []
+        for table_id in table_ids:
+            table_info = self.get_table_info(table_id)
+            if not table_info:
+                requests[table_id] = None
+                continue
+            field_spans = self.get_field_spans(table_id)
+            requests[table_id] = (table_info, field_spans)
+            spans.extend(field_spans)
+
+        span_values = dict(zip(spans, modbus_client.read_register_spans(spans, max_gap)))
+
+        results = {}
+        for table_id, request in requests.items():
+            if request is None:
+                results[table_id] = None
+                continue
+            table_info, field_spans = request
+            base_addr = table_info['base_address']
+            length = max([table_info['length']] + [addr - base_addr + size for addr, size in field_spans])
+            data = [0] * length
+            for addr, size in field_spans:
+                values = span_values.get((addr, size))
+                if values is None:
+                    data = None
+                    break
+                data[addr - base_addr:addr - base_addr + size] = values
+            results[table_id] = data
+        return results
+
     def get_available_tables(self):
         """获取可用的表格列表"""
         return list(self.models.keys()) 
\ No newline at end of file
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TcpTransport流水线测试：用本地MBAP应答服务器乱序回复，检查按事务ID匹配响应
+"""
+
+import socketserver
+import struct
+import threading
+import unittest
+
+from modbus_client import build_read_request
+from modbus_transport import TcpTransport
+
+SILENT_ADDRESS = 0xDEAD  # 服务器不应答该地址的请求
+
+
+def recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class MbapHandler(socketserver.BaseRequestHandler):
+    """
+    每收满server.batch个请求后倒序应答，应答寄存器值等于请求地址
+    server.stale为True时先发送一个未知事务ID的响应（模拟超时请求的迟到响应）
+    """
+
+    def handle(self):
+        batch = []
+        while True:
+            header = recv_exact(self.request, 7)
+            if header is None:
+                return
+            transaction_id, _, length, unit_id = struct.unpack('>HHHB', header)
+            pdu = recv_exact(self.request, length - 1)
+            if pdu is None:
+                return
+            _, address, _ = struct.unpack('>BHH', pdu)
+            self.server.transaction_ids.append(transaction_id)
+            batch.append((transaction_id, unit_id, address))
+            if len(batch) < self.server.batch:
+                continue
+            if self.server.stale:
+                self.request.sendall(self.response(0xFFFF, 1, 0))
+                self.server.stale = False
+            for transaction_id, unit_id, address in reversed(batch):
+                if address != SILENT_ADDRESS:
+                    self.request.sendall(self.response(transaction_id, unit_id, address))
+            batch = []
+
+    @staticmethod
+    def response(transaction_id, unit_id, value):
+        pdu = struct.pack('>BBH', 0x03, 2, value)
+        return struct.pack('>HHHB', transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+
+
+class MbapServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, batch):
+        super().__init__(('127.0.0.1', 0), MbapHandler)
+        self.batch = batch
+        self.stale = False
+        self.transaction_ids = []
+
+
+class PipelinedTransactTest(unittest.TestCase):
+
+    def start_server(self, batch):
+        self.server = MbapServer(batch)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.transport = TcpTransport('127.0.0.1', self.server.server_address[1], timeout=2)
+        self.assertTrue(self.transport.open())
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def read_requests(self, addresses, unit_id=1):
+        return [(unit_id, *build_read_request(0x03, address, 1)) for address in addresses]
+
+    def test_out_of_order_responses_matched_by_transaction_id(self):
+        self.start_server(batch=4)
+        addresses = [100, 200, 300, 400]
+        results = self.transport.transact_many(self.read_requests(addresses), window=4)
+        # 服务器倒序应答，结果仍按请求顺序对应
+        self.assertEqual([struct.unpack('>H', pdu[2:4])[0] for pdu in results], addresses)
+        self.assertEqual(len(set(self.server.transaction_ids)), len(addresses))
+
+    def test_window_limits_outstanding_requests(self):
+        # 服务器收满2个才应答，窗口为2时4个请求分两轮完成
+        self.start_server(batch=2)
+        addresses = [10, 20, 30, 40]
+        results = self.transport.transact_many(self.read_requests(addresses), window=2)
+        self.assertEqual([struct.unpack('>H', pdu[2:4])[0] for pdu in results], addresses)
+
+    def test_unknown_transaction_id_is_discarded(self):
+        self.start_server(batch=2)
+        self.server.stale = True
+        results = self.transport.transact_many(self.read_requests([1, 2]), window=2)
+        self.assertEqual([struct.unpack('>H', pdu[2:4])[0] for pdu in results], [1, 2])
+
+    def test_missing_response_times_out_alone(self):
+        self.start_server(batch=3)
+        addresses = [7, SILENT_ADDRESS, 9]
+        results = self.transport.transact_many(self.read_requests(addresses), window=3, timeout=0.3)
+        self.assertIsNone(results[1])
+        self.assertEqual(struct.unpack('>H', results[0][2:4])[0], 7)
+        self.assertEqual(struct.unpack('>H', results[2][2:4])[0], 9)
+        self.assertTrue(self.transport.is_open())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SunSpecProtocol字段索引测试：重复读取表格时不重新生成字段表、不重新编译模型
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import model_cache
+import sunspec_protocol
+from sunspec_protocol import SunSpecProtocol
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClient:
+    """按区间返回全0寄存器的假客户端"""
+
+    def __init__(self):
+        self.reads = 0
+
+    def read_register_spans(self, spans, max_gap=None):
+        self.reads += 1
+        return [[0] * count for _, count in spans]
+
+
+class TableInfoIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        # 模型文件按当前目录查找，编译缓存写到临时目录，不污染仓库
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        shutil.copy(os.path.join(REPO_DIR, 'model_802.json'), self.tmp)
+        os.chdir(self.tmp)
+        self.protocol = SunSpecProtocol(self.tmp)
+        self.protocol.set_model_base_address(802, 40070, 64)
+        # 两处编译入口都计数：重新登记后的文件加载走model_cache，直接赋值走sunspec_protocol
+        self.compiled = []
+        self.compile_model = sunspec_protocol.compile_model
+
+        def counting_compile(model_data):
+            self.compiled.append(model_data.get('id'))
+            return self.compile_model(model_data)
+        sunspec_protocol.compile_model = counting_compile
+        model_cache.compile_model = counting_compile
+
+    def tearDown(self):
+        sunspec_protocol.compile_model = self.compile_model
+        model_cache.compile_model = self.compile_model
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def read_table(self):
+        """与SunSpecGUI.read_table相同的调用路径"""
+        table_info = self.protocol.get_table_info(802)
+        data = self.protocol.read_tables(self.client, [802])[802]
+        return table_info, self.protocol.parse_table_data(802, data)
+
+    def test_repeated_read_table_reuses_index(self):
+        self.client = FakeClient()
+        first_info, first_parsed = self.read_table()
+        codec = self.protocol.get_codec(802)
+        self.compiled.clear()
+        for _ in range(5):
+            table_info, parsed = self.read_table()
+            # 字段表是编译时生成的同一个对象，不是每次重新生成
+            self.assertIs(table_info['fields'], first_info['fields'])
+            self.assertEqual(parsed.keys(), first_parsed.keys())
+        self.assertEqual(self.compiled, [])
+        self.assertIs(self.protocol.get_codec(802), codec)
+        self.assertEqual(self.client.reads, 6)
+
+    def test_single_field_uses_index(self):
+        codec = self.protocol.get_codec(802)
+        _, size, _ = codec.index['A']
+        self.compiled.clear()
+        field = self.protocol.parse_single_field(802, 'A', [0] * size)
+        self.assertEqual(field['value'], 0)
+        self.assertEqual(self.compiled, [])
+
+    def test_reload_invalidates_index(self):
+        codec = self.protocol.get_codec(802)
+        self.compiled.clear()
+        # 重新加载模型后按新的模型数据重新编译
+        self.protocol.models[802] = dict(self.protocol.models[802])
+        self.assertIsNot(self.protocol.get_codec(802), codec)
+        self.assertEqual(self.compiled, [802])
+
+    def edit_model_file(self, edit):
+        """修改临时目录中的模型文件，并把修改时间推后以免与加载时相同"""
+        path = os.path.join(self.tmp, 'model_802.json')
+        with open(path, encoding='utf-8') as f:
+            model_data = json.load(f)
+        edit(model_data)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(model_data, f)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_load_models_reloads_edited_file(self):
+        codec = self.protocol.get_codec(802)
+        self.protocol.delta_buffers[802] = [0] * codec.total_registers
+        self.compiled.clear()
+
+        def edit(model_data):
+            model_data['group']['label'] = 'Edited Battery'
+            model_data['group']['points'][2]['offset'] += 1
+        self.edit_model_file(edit)
+
+        # 文件名不变，只是内容被修改，重新登记后必须重新加载编译
+        self.protocol.load_models()
+        table_info = self.protocol.get_table_info(802)
+        self.assertEqual(table_info['name'], 'Edited Battery')
+        self.assertEqual(self.protocol.get_codec(802).index['AHRtg'][0], codec.index['AHRtg'][0] + 1)
+        self.assertIsNot(self.protocol.get_codec(802), codec)
+        self.assertEqual(self.compiled, [802])
+        self.assertNotIn(802, self.protocol.delta_buffers)
+
+    def test_load_models_keeps_unchanged_file(self):
+        codec = self.protocol.get_codec(802)
+        self.compiled.clear()
+        self.protocol.load_models()
+        self.assertIs(self.protocol.get_codec(802), codec)
+        self.assertEqual(self.compiled, [])
+
+
+if __name__ == '__main__':
+    unittest.main()